@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 def compute_acwr(df: pd.DataFrame):
@@ -10,3 +11,149 @@ def compute_acwr(df: pd.DataFrame):
     acwr = load7 / (load28 / 4) if load28 else None
     return {"acwr": acwr}
 
+def acwr_series(df: pd.DataFrame, date_col="Date", load_col="Minutes", athlete_col=None,
+                acute=7, chronic=28, min_periods=None):
+    """
+    ACWR за всеки ден от цяла история (една или много спортисти наведнъж).
+    df: DataFrame с дата и натоварване (по подразбиране 'Date' и 'Minutes');
+        athlete_col: колона със спортиста, ако историята е за група.
+    Историята се пренарежда в непрекъснат дневен календар (липсващи дни = 0,
+    повтарящи се дати се сумират). Връща по ред на ден:
+      Acute / Chronic        – средно дневно натоварване за acute/chronic дни (rolling)
+      ACWR                   – Acute / Chronic (coupled: хроничният прозорец включва острия)
+      EWMA_acute / EWMA_chronic / ACWR_EWMA – експоненциални варианти (λ = 2 / (N + 1))
+    ACWR е NaN, докато историята е по-къса от min_periods дни (по подразбиране chronic)
+    или хроничното натоварване е 0.
+    """
+    if min_periods is None:
+        min_periods = chronic
+    keys = [athlete_col] if athlete_col else []
+    d = df[keys + [date_col, load_col]].copy()
+    d[date_col] = pd.to_datetime(d[date_col]).dt.normalize()
+    d[load_col] = pd.to_numeric(d[load_col], errors="coerce").fillna(0.0)
+    d = d.dropna(subset=[date_col])
+    daily = d.groupby(keys + [date_col], sort=True)[load_col].sum()
+
+    # непрекъснат дневен календар за всеки спортист
+    r = daily.reset_index()
+    if athlete_col:
+        bounds = r.groupby(athlete_col, sort=True)[date_col].agg(["min", "max"])
+    else:
+        bounds = pd.DataFrame({"min": [r[date_col].min()], "max": [r[date_col].max()]}).dropna()
+    lengths = ((bounds["max"] - bounds["min"]).dt.days + 1).to_numpy(dtype=int)
+    n = int(lengths.sum())
+    pos = np.arange(n) - np.repeat(np.cumsum(lengths) - lengths, lengths)  # ден от началото на историята
+    group = np.repeat(np.arange(len(lengths)), lengths)
+    days = np.repeat(bounds["min"].to_numpy(dtype="datetime64[ns]"), lengths) + pos.astype("timedelta64[D]")
+    if athlete_col:
+        idx = pd.MultiIndex.from_arrays([np.repeat(bounds.index.to_numpy(), lengths), days], names=[athlete_col, date_col])
+    else:
+        idx = pd.DatetimeIndex(days, name=date_col)
+    load = pd.Series(daily.reindex(idx, fill_value=0.0).to_numpy(dtype=float))
+
+    by = load.groupby(group, sort=False)
+    acute_load = by.rolling(acute, min_periods=1).sum().droplevel(0).sort_index().to_numpy() / acute
+    chronic_load = by.rolling(chronic, min_periods=1).sum().droplevel(0).sort_index().to_numpy() / chronic
+    ewma_acute = by.ewm(alpha=2.0 / (acute + 1), adjust=False).mean().droplevel(0).sort_index().to_numpy()
+    ewma_chronic = by.ewm(alpha=2.0 / (chronic + 1), adjust=False).mean().droplevel(0).sort_index().to_numpy()
+
+    enough = pos + 1 >= min_periods
+    with np.errstate(divide="ignore", invalid="ignore"):
+        acwr = np.where(enough & (chronic_load > 0), acute_load / chronic_load, np.nan)
+        acwr_ewma = np.where(enough & (ewma_chronic > 0), ewma_acute / ewma_chronic, np.nan)
+
+    out = idx.to_frame(index=False)
+    out[load_col] = load.to_numpy()
+    out["Acute"] = acute_load
+    out["Chronic"] = chronic_load
+    out["ACWR"] = acwr
+    out["EWMA_acute"] = ewma_acute
+    out["EWMA_chronic"] = ewma_chronic
+    out["ACWR_EWMA"] = acwr_ewma
+    return out
+
+def _rolling_mean(load, window):
+    """Средно за последните window дни (по-рано: сума / window), чрез cumsum."""
+    cs = np.concatenate([[0.0], np.cumsum(load)])
+    t = np.arange(1, len(load) + 1)
+    return (cs[t] - cs[np.maximum(t - window, 0)]) / window
+
+def constrain_acwr(program: pd.DataFrame, band=(0.8, 1.3), acute=7, chronic=28, frozen=None,
+                   load_cols=None, date_col="Date", min_periods=None, max_iter=50, tol=1e-3):
+    """
+    Пренормира дневното натоварване на програма, така че ACWR да остане в band = (lo, hi).
+    program: една програма (напр. от generate_program); натоварването за деня е сумата от
+        load_cols (по подразбиране 'Zone 1' … 'Zone 5' и 'Strength').
+    frozen: булева маска на редовете, които не се променят (напр. тейпър прозорци и дни
+        със старт); ACWR се проверява само в свободните дни след min_periods (по подразбиране chronic).
+    Всички минути в деня се умножават по един и същи коефициент (acwr_row_scale), така че
+    разпределението по зони се запазва. Отчет в out.attrs["acwr"]: iterations,
+    violations_before, violations_after.
+    """
+    if load_cols is None:
+        load_cols = [c for c in program.columns if str(c).startswith("Zone ")] + \
+                    [c for c in ["Strength"] if c in program.columns]
+    out = program.copy()
+    loads = out[load_cols].apply(pd.to_numeric, errors="coerce").fillna(0.0).to_numpy(dtype=float).sum(axis=1)
+    row_scale, report = acwr_row_scale(out[date_col], loads, frozen=frozen, band=band, acute=acute, chronic=chronic,
+                                       min_periods=min_periods, max_iter=max_iter, tol=tol)
+    if len(out):
+        for col in load_cols:
+            out[col] = pd.to_numeric(out[col], errors="coerce") * row_scale
+    out.attrs["acwr"] = report
+    return out
+
+def acwr_row_scale(dates, loads, frozen=None, band=(0.8, 1.3), acute=7, chronic=28, min_periods=None,
+                   max_iter=50, tol=1e-3):
+    """
+    Ядрото на constrain_acwr върху масиви: дати и натоварване по редове → (множител за всеки ред, отчет).
+    Итеративно: на всяка стъпка ACWR за всички дни се смята с cumsum; за всеки ден извън
+    band се взима множителят, който би го върнал на границата, и всеки свободен ден в
+    острия му прозорец се умножава по геометричното средно на засягащите го множители.
+    """
+    lo, hi = band
+    if min_periods is None:
+        min_periods = chronic
+    rows_load = np.asarray(loads, dtype=float)
+    frozen = np.zeros(len(rows_load), dtype=bool) if frozen is None else np.asarray(frozen, dtype=bool)
+    dates = pd.to_datetime(pd.Series(np.asarray(dates))).dt.normalize()
+    if not len(rows_load) or dates.isna().all():
+        return np.ones(len(rows_load)), {"iterations": 0, "violations_before": 0, "violations_after": 0}
+
+    # непрекъснат дневен календар: ден от началото на програмата
+    day = (dates - dates.min()).dt.days.fillna(-1).to_numpy(dtype=int)
+    valid = day >= 0
+    n = int(day.max()) + 1
+    load = np.bincount(day[valid], rows_load[valid], n)
+    free = np.bincount(day[valid], frozen[valid] | ~valid[valid], n) == 0
+    free &= np.bincount(day[valid], minlength=n) > 0
+    check = free & (np.arange(n) + 1 >= min_periods)
+    k = acute / chronic
+
+    scale = np.ones(n)
+    violations_before = None
+    for it in range(max_iter + 1):
+        cur = load * scale
+        a, c = _rolling_mean(cur, acute), _rolling_mean(cur, chronic)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = np.where(c > 0, a / c, np.nan)
+        viol = check & ((r > hi * (1 + tol)) | (r < lo * (1 - tol)))
+        if violations_before is None:
+            violations_before = int(viol.sum())
+        if not viol.any() or it == max_iter:
+            break
+        # множител за острия прозорец, който връща r до границата (хроничният включва острия)
+        target = np.clip(r, lo, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            g = target * (1 - r * k) / (r * (1 - target * k))
+        log_g = np.where(viol & np.isfinite(g) & (g > 0), np.log(np.clip(g, 0.5, 2.0)), 0.0)
+        # ден d е в острите прозорци на дните d … d+acute-1
+        s_log = np.convolve(log_g, np.ones(acute))[acute - 1:acute - 1 + n]
+        s_cnt = np.convolve(viol.astype(float), np.ones(acute))[acute - 1:acute - 1 + n]
+        step = np.where(free & (s_cnt > 0), np.exp(s_log / np.maximum(s_cnt, 1)), 1.0)
+        if np.abs(step[load > 0] - 1).max(initial=0.0) < 1e-9:
+            break  # не може да се подобри (напр. само нулеви или замразени дни в прозорците)
+        scale *= step
+
+    row_scale = np.where(valid, scale[np.maximum(day, 0)], 1.0)
+    return row_scale, {"iterations": it, "violations_before": violations_before, "violations_after": int(viol.sum())}
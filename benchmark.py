@@ -0,0 +1,149 @@
+"""Stage-level benchmark of the program generator on synthetic base calendars.
+
+    python benchmark.py --out bench.json
+    python benchmark.py --seasons 1 3 --starts 0 30 --repeat 5
+
+Each pipeline stage is timed separately (best and median of --repeat runs) and
+results go out as JSON, so runs from different versions can be compared. The public
+stage functions are timed standalone; "generate_program.<stage>" records come from
+generate_program's profile callback, i.e. the stages as the pipeline actually runs them.
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import biathlon_program_generator_segments_taper_v2 as g
+
+
+def synthetic_base(seasons=1, n_starts=10, with_type=True, seed=0):
+    """Base calendar of `seasons` × 365 days with random zone minutes and n_starts starts in the winters.
+
+    Returns (base_df, starts); every third start (and the last one) is a main start.
+    """
+    rng = np.random.default_rng(seed)
+    days = 365 * seasons
+    dates = pd.date_range("2020-05-01", periods=days, freq="D")
+    df = pd.DataFrame({"Date": dates})
+    for i, z in enumerate(g.ZONE_COLS):
+        v = rng.uniform(0, 90 / (i + 1), days).round(1)
+        v[rng.random(days) < 0.15] = 0.0
+        df[z] = v
+    # races only from December to March
+    winter = np.flatnonzero(dates.month.isin([12, 1, 2, 3]))
+    picks = np.sort(rng.choice(winter, min(n_starts, len(winter)), replace=False))
+    types = ["Main start" if (j % 3 == 0 or j == len(picks) - 1) else "Control start" for j in range(len(picks))]
+    starts = [{"date": dates[k].date().isoformat(), "type": t} for k, t in zip(picks, types)]
+    if with_type:
+        col = np.full(days, "", dtype=object)
+        col[picks] = types
+        df["Type"] = col
+    return df, starts
+
+
+def _xlsx_bytes(df):
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def _time(fn, repeat):
+    runs = []
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        runs.append(time.perf_counter() - t0)
+    return out, {"best_s": min(runs), "median_s": statistics.median(runs)}
+
+
+def _time_stages(fn, repeat):
+    """Best/median seconds per stage over repeat runs of fn(profile_callback)."""
+    runs = {}
+    for _ in range(repeat):
+        fn(lambda rec: runs.setdefault(rec["stage"], []).append(rec["seconds"]))
+    return {stage: {"best_s": min(r), "median_s": statistics.median(r)} for stage, r in runs.items()}
+
+
+def bench_case(seasons, n_starts, with_type, repeat=3, seed=0):
+    """Time every stage of generate_program for one synthetic calendar; returns a list of records."""
+    base_df, starts = synthetic_base(seasons, n_starts, with_type, seed)
+    data = _xlsx_bytes(base_df)
+    nstarts = g._normalize_starts(starts)
+    stats = {}
+
+    base, stats["load_base"] = _time(lambda: g.load_base(data), repeat)
+    taper, stats["derive_taper_profile"] = _time(lambda: g.derive_taper_profile(base, window_days=7), repeat)
+    focus, stats["derive_focus_pattern"] = _time(lambda: g.derive_focus_pattern(base), repeat)
+    _, stats["derive_prep_tercile_multipliers"] = _time(lambda: g.derive_prep_tercile_multipliers(base), repeat)
+
+    themes = g.assign_week_theme(base, base["Date"].min())
+    df, stats["adjust_by_theme"] = _time(lambda: g.adjust_by_theme(base, themes), repeat)
+    df["Week_theme"] = themes.values
+    df, stats["enforce_focus_days"] = _time(
+        lambda: g.enforce_focus_days(df, focus["focus_mult_hi"], focus["focus_mult_lo"]), repeat)
+    df, stats["_finalize_phases_and_trim"] = _time(lambda: g._finalize_phases_and_trim(df.copy(), starts), repeat)
+
+    def taper_and_start_rules():
+        idx = g.build_date_index(df)
+        out = g.taper_apply_profile(df, nstarts, taper, vo2_scale=1.0, window_days=7, date_index=idx)
+        return g.enforce_start_day_rules(out, nstarts, date_index=idx)
+    df, stats["taper_and_start_rules"] = _time(taper_and_start_rules, repeat)
+    _, stats["days_to_next_start"] = _time(lambda: g.days_to_next_start(df["Date"], nstarts), repeat)
+
+    calendar, stats["base_calendar"] = _time(lambda: g.BaseCalendar(base, focus), repeat)
+    prepared = {"base_df": base, "taper_profile": taper, "focus_pattern": focus,
+                "tercile_mult": g.derive_prep_tercile_multipliers(base), "calendar": calendar}
+    _, stats["generate_program"] = _time(lambda: g.generate_program(65, starts, base=prepared), repeat)
+    for stage, t in _time_stages(lambda cb: g.generate_program(65, starts, base=prepared, profile=cb), repeat).items():
+        stats["generate_program." + stage] = t
+
+    case = {"seasons": seasons, "starts": n_starts, "with_type": with_type, "rows": len(base_df), "repeat": repeat}
+    return [dict(case, stage=stage, **t) for stage, t in stats.items()]
+
+
+def run(seasons=(1, 3, 10), starts=(0, 10, 30, 100), with_type=(True, False), repeat=3):
+    results = []
+    for s in seasons:
+        for n in starts:
+            for wt in with_type:
+                results.extend(bench_case(s, n, wt, repeat=repeat))
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seasons", type=int, nargs="+", default=[1, 3, 10])
+    ap.add_argument("--starts", type=int, nargs="+", default=[0, 10, 30, 100])
+    ap.add_argument("--type", choices=["both", "with", "without"], default="both",
+                    help="synthetic bases with a 'Type' column, without, or both")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None, help="JSON output file (default: stdout)")
+    args = ap.parse_args(argv)
+
+    with_type = {"both": (True, False), "with": (True,), "without": (False,)}[args.type]
+    report = run(args.seasons, args.starts, with_type, args.repeat)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
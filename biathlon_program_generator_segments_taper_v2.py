@@ -1,14 +1,24 @@
 
 import pandas as pd
 import numpy as np
-import random
+from collections import deque
 from datetime import timedelta
+from functools import partial
+from itertools import islice
+
+from acwr_model import acwr_row_scale
+from profiling import StageProfiler
+from workbook_io import read_table
+
+ZONE_COLS = ["Zone 1","Zone 2","Zone 3","Zone 4","Zone 5","Strength"]
 
 # ===============================
 # Helpers to read base & find patterns
 # ===============================
 def load_base(base_path):
-    df = pd.read_excel(base_path)
+    """base_path: path, raw bytes or a file-like object with the base Excel workbook
+    (or a .csv / .parquet path); read through workbook_io.read_table."""
+    df = read_table(base_path)
     # Normalize columns
     if "Date" in df.columns:
         df["Date"] = pd.to_datetime(df["Date"])
@@ -66,41 +76,53 @@ def _week_index(df, start_date):
 # ===============================
 # Patterns derived from base file
 # ===============================
+def _default_taper_profile(window_days=7):
+    # default conservative taper: totals and proportions (totals hold the 7-day value further out)
+    offsets = range(1, window_days+1)
+    totals = {k: float(60 - (min(k, 7)-1)*5) for k in offsets}  # decreasing totals
+    # proportions: Z1↑, Z3-5↓, Strength↓
+    props = {k: {"Zone 1":0.55, "Zone 2":0.25, "Zone 3":0.12, "Zone 4":0.06, "Zone 5":0.02, "Strength":0.0} for k in offsets}
+    return {"totals": totals, "props": props}
+
 def derive_taper_profile(base_df, window_days=7):
-    """Average last-N-days (per offset) zone distribution & total minutes from base before any starts."""
+    """Average last-N-days (per offset) zone distribution & total minutes from base before any starts.
+
+    window_days: taper length (7 by default; 14 or 21 for longer tapers). A day that falls in the
+    windows of several starts counts once per start, at its offset to each.
+    """
     zone_cols = [c for c in base_df.columns if c.lower().startswith("zone ") or c.lower()=="strength"]
-    starts = base_df.loc[base_df["Is_Start"], "Date"].sort_values().tolist()
-    if not starts:
-        # default conservative taper: totals and proportions
-        offsets = range(1, window_days+1)
-        totals = {k: float(60 - (k-1)*5) for k in offsets}  # decreasing totals
-        # proportions: Z1↑, Z3-5↓, Strength↓
-        props = {k: {"Zone 1":0.55, "Zone 2":0.25, "Zone 3":0.12, "Zone 4":0.06, "Zone 5":0.02, "Strength":0.0} for k in offsets}
-        return {"totals": totals, "props": props}
-
-    recs = []
-    for d in starts:
-        s = base_df[(base_df["Date"] >= d - timedelta(days=window_days)) & (base_df["Date"] < d)].copy()
-        if s.empty: 
-            continue
-        s["offset"] = (d - s["Date"]).dt.days  # 1..7
-        # daily sums & proportions
-        s["Day_total"] = s[zone_cols].sum(axis=1)
-        for z in zone_cols:
-            s[z+"_prop"] = np.where(s["Day_total"]>0, s[z]/s["Day_total"], 0.0)
-        recs.append(s)
-    if not recs:
-        return derive_taper_profile(base_df, window_days)  # fallback
-
-    T = pd.concat(recs, ignore_index=True)
-    # average per offset
-    totals = T.groupby("offset")["Day_total"].mean().to_dict()
+    starts = np.sort(base_df.loc[base_df["Is_Start"], "Date"].to_numpy(dtype="datetime64[ns]"))
+    if not len(starts):
+        return _default_taper_profile(window_days)
+
+    # join every start with the base days in [start - window_days, start) in one pass
+    dates = base_df["Date"].to_numpy(dtype="datetime64[ns]")
+    order = np.argsort(dates, kind="stable")
+    lo = np.searchsorted(dates[order], starts - np.timedelta64(window_days, "D"), side="left")
+    counts = np.searchsorted(dates[order], starts, side="left") - lo
+    if not counts.sum():
+        return _default_taper_profile(window_days)
+    start_no = np.repeat(np.arange(len(starts)), counts)
+    rows = order[np.repeat(lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)]
+    keep = np.lexsort((rows, start_no))  # start by start, base row order within a window
+    start_no, rows = start_no[keep], rows[keep]
+
+    Z = base_df[zone_cols].to_numpy(dtype=float)[rows]
+    T = pd.DataFrame(Z, columns=zone_cols)
+    T["Day_total"] = T[zone_cols].sum(axis=1)
+    # daily proportions
+    prop_cols = [z for z in ZONE_COLS if z in zone_cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        P = np.where(T[["Day_total"]].to_numpy() > 0, T[prop_cols].to_numpy() / T[["Day_total"]].to_numpy(), 0.0)
+    T[[z+"_prop" for z in prop_cols]] = P
+    T["offset"] = (starts[start_no] - dates[rows]) // np.timedelta64(1, "D")  # 1..N
+    # average per offset: totals and proportions in one groupby
+    G = T.groupby("offset")[["Day_total"] + [z+"_prop" for z in prop_cols]].mean()
+
+    totals = {int(k): float(v) for k, v in G["Day_total"].items()}
     props = {}
-    for k, g in T.groupby("offset"):
-        dct = {}
-        for z in ["Zone 1","Zone 2","Zone 3","Zone 4","Zone 5","Strength"]:
-            if z in g.columns:
-                dct[z] = float(g[z+"_prop"].mean())
+    for k, row in G.iterrows():
+        dct = {z: float(row[z+"_prop"]) for z in prop_cols}
         # ensure props sum to 1.0
         ssum = sum(dct.values())
         if ssum <= 0:
@@ -114,8 +136,8 @@ def derive_taper_profile(base_df, window_days=7):
         if k not in props:
             props[k] = {"Zone 1":0.6,"Zone 2":0.25,"Zone 3":0.1,"Zone 4":0.04,"Zone 5":0.01,"Strength":0.0}
         if k not in totals:
-            totals[k] = 60.0 - (k-1)*5.0
-    return {"totals": {int(k): float(v) for k,v in totals.items()}, "props": props}
+            totals[k] = 60.0 - (min(k, 7)-1)*5.0
+    return {"totals": totals, "props": props}
 
 def derive_focus_pattern(base_df):
     """Estimate 'focus day' intensity pattern from base: how much Z4+Z5 concentrates on peak day vs others."""
@@ -143,257 +165,746 @@ def derive_focus_pattern(base_df):
     lo = max(1.0 - (hi-1.0)*0.6, 0.6)
     return {"focus_mult_hi": hi, "focus_mult_lo": lo}
 
+# Tercile multiplier keys, in ZONE_COLS order
+TERCILE_KEYS = ["early", "mid", "late"]
+TERCILE_ZONE_KEYS = ["Z1", "Z2", "Z3", "Z4", "Z5", "S"]
+DEFAULT_TERCILE_MULT = {"early":{"Z1":1.05,"Z2":1.03,"Z3":0.95,"Z4":0.9,"Z5":0.85,"S":1.0},
+                        "mid":{"Z1":0.98,"Z2":1.02,"Z3":1.05,"Z4":1.08,"Z5":1.05,"S":1.05},
+                        "late":{"Z1":0.95,"Z2":1.0,"Z3":1.08,"Z4":1.12,"Z5":1.10,"S":1.05}}
+
+def tercile_labels(n):
+    """Tercile (0 early, 1 mid, 2 late) of each of n consecutive rows, split like np.array_split."""
+    return np.repeat(np.arange(3), [len(p) for p in np.array_split(np.arange(n), 3)])
+
+def tercile_matrix(tercile_mult):
+    """{'early': {'Z1': …}, …} → 3 × ZONE_COLS multiplier matrix (rows early, mid, late)."""
+    return np.array([[tercile_mult[t][z] for z in TERCILE_ZONE_KEYS] for t in TERCILE_KEYS])
+
 def derive_prep_tercile_multipliers(base_df):
     """Relative emphasis by terciles in preparatory phase (before first main)."""
+    default = {t: dict(m) for t, m in DEFAULT_TERCILE_MULT.items()}
     if "Date" not in base_df.columns:
-        return {"early":{"Z1":1.05,"Z2":1.03,"Z3":0.95,"Z4":0.9,"Z5":0.85,"S":1.0},
-                "mid":{"Z1":0.98,"Z2":1.02,"Z3":1.05,"Z4":1.08,"Z5":1.05,"S":1.05},
-                "late":{"Z1":0.95,"Z2":1.0,"Z3":1.08,"Z4":1.12,"Z5":1.10,"S":1.05}}
-    starts = base_df.loc[base_df["Start_type"]=="Main start","Date"].sort_values().tolist()
-    if not starts:
-        return {"early":{"Z1":1.05,"Z2":1.03,"Z3":0.95,"Z4":0.9,"Z5":0.85,"S":1.0},
-                "mid":{"Z1":0.98,"Z2":1.02,"Z3":1.05,"Z4":1.08,"Z5":1.05,"S":1.05},
-                "late":{"Z1":0.95,"Z2":1.0,"Z3":1.08,"Z4":1.12,"Z5":1.10,"S":1.05}}
-    first_main = starts[0]
-    prep = base_df[base_df["Date"] < first_main].copy()
-    if prep.empty:
-        return {"early":{"Z1":1.05,"Z2":1.03,"Z3":0.95,"Z4":0.9,"Z5":0.85,"S":1.0},
-                "mid":{"Z1":0.98,"Z2":1.02,"Z3":1.05,"Z4":1.08,"Z5":1.05,"S":1.05},
-                "late":{"Z1":0.95,"Z2":1.0,"Z3":1.08,"Z4":1.12,"Z5":1.10,"S":1.05}}
-    n = len(prep)
-    terciles = np.array_split(prep.index.values, 3)
-    def zone_sum(idx):
-        s = prep.loc[idx, ["Zone 1","Zone 2","Zone 3","Zone 4","Zone 5","Strength"]].sum()
-        return s
-    sums = [zone_sum(t) for t in terciles if len(t)>0]
-    if len(sums)<3:
-        return {"early":{"Z1":1.05,"Z2":1.03,"Z3":0.95,"Z4":0.9,"Z5":0.85,"S":1.0},
-                "mid":{"Z1":0.98,"Z2":1.02,"Z3":1.05,"Z4":1.08,"Z5":1.05,"S":1.05},
-                "late":{"Z1":0.95,"Z2":1.0,"Z3":1.08,"Z4":1.12,"Z5":1.10,"S":1.05}}
-    tot = sum(sums)
-    props = [s / tot for s in sums]
-    # Convert to intuitive multipliers around 1.0 by comparing each zone prop to mean
-    mean_prop = sum(props) / 3.0
-    mult = []
-    for p in props:
-        m = {}
-        for z_key, z_name in zip(["Z1","Z2","Z3","Z4","Z5","S"], ["Zone 1","Zone 2","Zone 3","Zone 4","Zone 5","Strength"]):
-            base = p.get(z_name, 1/6)
-            avg = mean_prop.get(z_name, 1/6)
-            # gentle scaling around 1
-            m[z_key] = float(np.clip(0.8 + (base/avg)*0.2, 0.85, 1.15))
-        mult.append(m)
-    return {"early": mult[0], "mid": mult[1], "late": mult[2]}
+        return default
+    main = base_df.loc[base_df["Start_type"]=="Main start", "Date"]
+    if main.empty:
+        return default
+    prep = (base_df["Date"] < main.min()).to_numpy()
+    n = int(prep.sum())
+    if n < 3:
+        return default
+    # 3 × ZONE_COLS tercile sums; zones missing from the file count as even (1/6)
+    cols = [z for z in ZONE_COLS if z in base_df.columns]
+    sums = np.full((3, len(ZONE_COLS)), np.nan)
+    Z = base_df.loc[prep, cols].to_numpy(dtype=float)
+    sums[:, [ZONE_COLS.index(c) for c in cols]] = [part.sum(axis=0) for part in np.array_split(Z, 3)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        props = sums / sums.sum(axis=0)
+    mean_prop = props.mean(axis=0)
+    props = np.where(np.isnan(sums), 1/6, props)
+    mean_prop = np.where(np.isnan(sums[0]), 1/6, mean_prop)
+    # gentle scaling around 1, comparing each zone prop to its mean over the terciles
+    mult = np.clip(0.8 + (props / mean_prop) * 0.2, 0.85, 1.15)
+    return {t: {z: float(mult[i, j]) for j, z in enumerate(TERCILE_ZONE_KEYS)} for i, t in enumerate(TERCILE_KEYS)}
 
 # ===============================
 # Core adjustments
 # ===============================
 def assign_week_theme(df, start_date):
-    weeks = ((df["Date"] - start_date).dt.days // 7).astype(int)
-    themes = []
-    for w in weeks:
-        if w % 4 == 3:
-            themes.append("recovery")
-        elif w % 3 == 1:
-            themes.append("strength")
-        else:
-            themes.append("endurance")
-    return pd.Series(themes, index=df.index)
-
-def adjust_by_theme(df, themes):
+    weeks = ((df["Date"] - start_date).dt.days // 7).astype(int).to_numpy()
+    themes = np.select([weeks % 4 == 3, weeks % 3 == 1], ["recovery", "strength"], default="endurance")
+    return pd.Series(themes.astype(object), index=df.index)
+
+# Per-theme multipliers over ZONE_COLS (Z1..Z5, Strength)
+THEME_MULT = {
+    "endurance": [1.05, 1.05, 1.0, 1.0, 1.0, 1.0],
+    "strength":  [1.0, 1.0, 1.0, 1.0, 1.0, 1.2],
+    "recovery":  [0.5, 0.5, 0.5, 0.5, 0.5, 0.5],
+}
+
+def theme_multipliers(themes):
+    """Days × ZONE_COLS multiplier matrix for the week themes (1.0 for unknown themes)."""
+    lut = np.vstack([np.ones(len(ZONE_COLS))] + [THEME_MULT[t] for t in THEME_MULT])
+    codes = pd.Categorical(np.asarray(themes, dtype=object), categories=list(THEME_MULT)).codes
+    return lut[codes + 1]
+
+def focus_day_multipliers(df, focus_mult_hi=1.5, focus_mult_lo=0.7):
+    """Days × ZONE_COLS multiplier matrix concentrating Z4/Z5 on 2 focus days per week."""
+    n = len(df)
+    mult = np.ones((n, len(ZONE_COLS)))
+    if n == 0:
+        return mult
+    week = pd.Series(((df["Date"] - df["Date"].min()).dt.days // 7).astype(int).to_numpy())
+    grp = week.groupby(week)
+    pos = grp.cumcount().to_numpy()
+    size = grp.transform("size").to_numpy()
+    # focus days, deterministically: middle and second-to-last of each week
+    is_focus = (pos == size // 2) | (pos == np.where(size >= 2, size - 2, size - 1))
+    active = np.ones(n, dtype=bool)
+    if "Week_theme" in df.columns:
+        # skip recovery themed weeks (majority labeled recovery)
+        rec = pd.Series((df["Week_theme"] == "recovery").to_numpy().astype(int)).groupby(week).transform("sum").to_numpy()
+        active = rec * 2 < size
+    hi_lo = np.where(is_focus, focus_mult_hi, focus_mult_lo)
+    mult[:, 3] = np.where(active, hi_lo, 1.0)
+    mult[:, 4] = mult[:, 3]
+    return mult
+
+def apply_zone_multipliers(df, mult):
+    """Multiply the zone columns present in df by a days × ZONE_COLS matrix in one go."""
     out = df.copy()
-    for idx, theme in themes.items():
-        if theme == "endurance":
-            for c in ["Zone 1","Zone 2"]:
-                if c in out.columns:
-                    out.loc[idx, c] = out.loc[idx, c] * 1.05
-        elif theme == "strength":
-            if "Strength" in out.columns:
-                out.loc[idx, "Strength"] = out.loc[idx, "Strength"] * 1.2
-        elif theme == "recovery":
-            for col in ["Zone 1","Zone 2","Zone 3","Zone 4","Zone 5","Strength"]:
-                if col in out.columns:
-                    out.loc[idx, col] = out.loc[idx, col] * 0.5
+    pos = [i for i, c in enumerate(ZONE_COLS) if c in out.columns]
+    if pos:
+        cols = [ZONE_COLS[i] for i in pos]
+        out[cols] = out[cols].to_numpy(dtype=float) * mult[:, pos]
     return out
 
+def adjust_by_theme(df, themes):
+    return apply_zone_multipliers(df, theme_multipliers(themes.reindex(df.index)))
+
 def enforce_focus_days(df, focus_mult_hi=1.5, focus_mult_lo=0.7):
     """Concentrate Z4/Z5 on 1–2 days per week like in real files."""
-    out = df.copy()
-    out["Week"] = ((out["Date"] - out["Date"].min()).dt.days // 7).astype(int)
-    for w, g in out.groupby("Week"):
-        if g.empty: continue
-        idxs = g.index.tolist()
-        # skip if this is a recovery themed week (majority labeled recovery)
-        if "Week_theme" in out.columns:
-            if (g["Week_theme"]=="recovery").sum() >= len(g)/2:
-                continue
-        # choose 2 focus days deterministically: middle and second-to-last
-        f1 = idxs[len(idxs)//2]
-        f2 = idxs[-2] if len(idxs) >= 2 else idxs[-1]
-        # apply multipliers
-        for i in idxs:
-            if i in [f1, f2]:
-                if "Zone 4" in out.columns:
-                    out.loc[i, "Zone 4"] *= focus_mult_hi
-                if "Zone 5" in out.columns:
-                    out.loc[i, "Zone 5"] *= focus_mult_hi
-            else:
-                if "Zone 4" in out.columns:
-                    out.loc[i, "Zone 4"] *= focus_mult_lo
-                if "Zone 5" in out.columns:
-                    out.loc[i, "Zone 5"] *= focus_mult_lo
-    out.drop(columns=["Week"], inplace=True)
-    return out
+    out = apply_zone_multipliers(df, focus_day_multipliers(df, focus_mult_hi, focus_mult_lo))
+    # a base 'Week' column is not carried past this stage (recomputed on export)
+    return out.drop(columns=["Week"], errors="ignore")
+
+def build_date_index(df):
+    """Date → row-position index over df["Date"] (normalized); build once per program, share between stages."""
+    day = df["Date"].dt.normalize().to_numpy(dtype="datetime64[ns]")
+    order = np.argsort(day, kind="stable")
+    return {"days": day[order], "rows": order}
+
+def _lookup_rows(date_index, days):
+    """Row positions for each of `days` as (rows, query) pairs, ordered by query (several rows may share a date)."""
+    days = np.asarray(days, dtype="datetime64[ns]")
+    lo = np.searchsorted(date_index["days"], days, side="left")
+    counts = np.searchsorted(date_index["days"], days, side="right") - lo
+    query = np.repeat(np.arange(len(days)), counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = date_index["rows"][np.repeat(lo, counts) + within]
+    return rows, query
+
+# start-day minutes: (column, low, high); one row of draws per start, in this column order
+START_DAY_RANGES = [("Zone 5", 10.0, 15.0), ("Zone 4", 3.0, 6.0), ("Zone 1", 15.0, 30.0),
+                    ("Zone 2", 0.0, 5.0), ("Zone 3", 0.0, 5.0), ("Strength", 0.0, 5.0)]
+
+# Array kernels shared by the public stage functions below and by _build_program();
+# `lookup(days)` returns (rows, query) pairs as _lookup_rows does.
+def _taper_targets(lookup, s_days, profile, zone_cols, vo2_scale=1.0, window_days=7):
+    """(rows, values): taper minutes (rows × zone_cols) for the window_days before each start;
+    where windows overlap, the last (start, offset) in start-major order wins."""
+    offsets = np.arange(1, window_days+1)
+    rows, query = lookup((s_days[:, None] - offsets[None, :].astype("timedelta64[D]")).ravel())
+    if not len(rows) or not zone_cols:
+        return rows[:0], np.zeros((0, len(zone_cols)))
+    last = len(rows) - 1 - np.unique(rows[::-1], return_index=True)[1]
+    rows, query = rows[last], query[last]
+    # per-offset target minutes per zone
+    values = np.array([[profile["totals"].get(k, 60.0) * vo2_scale * profile["props"].get(k, {}).get(z, 0.0)
+                        for z in zone_cols] for k in offsets])
+    return rows, values[query % window_days]
+
+def _start_day_draws(rng, n_starts):
+    """Start-day minutes, one row of START_DAY_RANGES draws per start (in start order)."""
+    lo, hi = np.array([[r[1] for r in START_DAY_RANGES], [r[2] for r in START_DAY_RANGES]])
+    return rng.uniform(lo, hi, size=(n_starts, len(START_DAY_RANGES)))
+
+def _fill_start_types(start_type, rows, query, types):
+    """In place: a start writes its type on its rows only if one of them is still empty."""
+    fill = np.bincount(query, start_type[rows] == "", minlength=len(types)) > 0
+    start_type[rows[fill[query]]] = types[query[fill[query]]]
+
+def _next_start(day, s_days, s_types):
+    """Days to the next start on/after each day (NaN if none) and its type (''); s_days sorted."""
+    pos = np.searchsorted(s_days, day, side="left")
+    has_next = pos < len(s_days)
+    delta = np.full(len(day), np.nan)
+    delta[has_next] = (s_days[pos[has_next]] - day[has_next]) / np.timedelta64(1, "D")
+    return delta, np.append(s_types, "").astype(object)[pos]
+
+def _phases(dates, first_main):
+    if first_main is None:
+        return "Preparatory"
+    return np.where(dates < np.datetime64(first_main), "Preparatory", "Competition")
+
+def _set_type_column(df, type_rows, start_type):
+    """Backward-compatible 'Type': start rows take their start type, other rows keep the base value."""
+    if "Type" not in df.columns:
+        df["Type"] = np.where(type_rows, start_type, "")
+    else:
+        # an all-empty 'Type' column comes back from Excel as NaN floats
+        if pd.api.types.is_numeric_dtype(df["Type"]):
+            df["Type"] = df["Type"].astype(object)
+        df.loc[type_rows, "Type"] = start_type[type_rows]
+
+def _start_days(starts):
+    return np.array([pd.to_datetime(st["date"]).normalize() for st in starts], dtype="datetime64[ns]")
 
-def taper_apply_profile(df, starts, profile, vo2_scale=1.0, window_days=7):
+def taper_apply_profile(df, starts, profile, vo2_scale=1.0, window_days=7, date_index=None):
     """Override the last N days before each start to follow base taper profile exactly (scaled by VO2)."""
     out = df.copy()
-    for st in starts:
-        d = pd.to_datetime(st["date"]).normalize()
-        for k in range(1, window_days+1):
-            day = d - timedelta(days=k)
-            mask = out["Date"].dt.normalize() == day
-            if not mask.any():
-                continue
-            target_total = profile["totals"].get(k, 60.0) * vo2_scale
-            props = profile["props"].get(k, {})
-            # write zones
-            for z_key in ["Zone 1","Zone 2","Zone 3","Zone 4","Zone 5","Strength"]:
-                if z_key in out.columns:
-                    out.loc[mask, z_key] = target_total * props.get(z_key, 0.0)
+    cols = [z for z in ZONE_COLS if z in out.columns]
+    if not starts or not cols:
+        return out
+    if date_index is None:
+        date_index = build_date_index(out)
+    rows, values = _taper_targets(lambda days: _lookup_rows(date_index, days), _start_days(starts), profile,
+                                  cols, vo2_scale, window_days)
+    if len(rows):
+        out.iloc[rows, [out.columns.get_loc(c) for c in cols]] = values
     return out
 
-def enforce_start_day_rules(df, starts):
-    """On start days: Zone 5 ≈ 10–15 min; keep others minimal (short warmup/cooldown)."""
+def enforce_start_day_rules(df, starts, date_index=None, rng=None):
+    """On start days: Zone 5 ≈ 10–15 min; keep others minimal (short warmup/cooldown).
+    rng: numpy Generator; values for all starts are drawn in one call (one row per start,
+    also for starts outside the calendar, so a start's values depend only on its position)."""
     out = df.copy()
-    for st in starts:
-        d = pd.to_datetime(st["date"]).normalize()
-        m = out["Date"].dt.normalize() == d
-        if not m.any(): 
-            continue
-        # set Z5
-        z5 = float(np.random.uniform(10.0, 15.0))
-        if "Zone 5" in out.columns:
-            out.loc[m, "Zone 5"] = z5
-        # light Z4 (3–6), some Z1 cool/warm (15–30), others near 0
-        if "Zone 4" in out.columns:
-            out.loc[m, "Zone 4"] = float(np.random.uniform(3.0, 6.0))
-        if "Zone 1" in out.columns:
-            out.loc[m, "Zone 1"] = float(np.random.uniform(15.0, 30.0))
-        for c in ["Zone 2","Zone 3","Strength"]:
-            if c in out.columns:
-                out.loc[m, c] = float(np.random.uniform(0.0, 5.0))
-        # mark
-        if "Is_Start" in out.columns:
-            out.loc[m, "Is_Start"] = True
-        if "Start_type" in out.columns and out.loc[m, "Start_type"].eq("").any():
-            out.loc[m, "Start_type"] = st.get("type","")
-        if "Type" in out.columns:
-            out.loc[m, "Type"] = st.get("type","")
+    if not starts:
+        return out
+    if rng is None:
+        rng = np.random.default_rng()
+    if date_index is None:
+        date_index = build_date_index(out)
+    draws = _start_day_draws(rng, len(starts))
+    rows, query = _lookup_rows(date_index, _start_days(starts))
+    if not len(rows):
+        return out
+    for j, (c, _, _) in enumerate(START_DAY_RANGES):
+        if c in out.columns:
+            out.iloc[rows, out.columns.get_loc(c)] = draws[query, j]
+    # mark
+    types = np.array([st.get("type","") for st in starts], dtype=object)
+    if "Is_Start" in out.columns:
+        out.iloc[rows, out.columns.get_loc("Is_Start")] = True
+    if "Start_type" in out.columns:
+        start_type = out["Start_type"].to_numpy(dtype=object, copy=True)
+        _fill_start_types(start_type, rows, query, types)
+        out.iloc[rows, out.columns.get_loc("Start_type")] = start_type[rows]
+    if "Type" in out.columns:
+        out.iloc[rows, out.columns.get_loc("Type")] = types[query]
     return out
 
+def days_to_next_start(dates, starts):
+    """Days until the next start on/after each date (NaN if none) and that start's type ('' if none).
+
+    dates: Series/array of dates; starts: [{'date', 'type'}, ...] (raw or normalized).
+    Returns a DataFrame with 'Days_to_next_start' and 'Next_start_type', aligned to dates.
+    """
+    index = dates.index if isinstance(dates, pd.Series) else None
+    day = pd.to_datetime(pd.Series(np.asarray(dates))).dt.normalize().to_numpy(dtype="datetime64[ns]")
+    nstarts = _normalize_starts(starts)
+    s_dates = np.array([s["date"] for s in nstarts], dtype="datetime64[ns]")
+    s_types = np.array([s["type"] for s in nstarts], dtype=object)
+    order = np.argsort(s_dates, kind="stable")
+    delta, types = _next_start(day, s_dates[order], s_types[order])
+    return pd.DataFrame({"Days_to_next_start": delta, "Next_start_type": types}, index=index)
+
 def _finalize_phases_and_trim(df, starts):
     nstarts = _normalize_starts(starts)
     if not isinstance(df["Date"].dtype, pd.DatetimeTZDtype):
         df["Date"] = pd.to_datetime(df["Date"])
 
     # clear start flags then set exact matches
-    df["Is_Start"] = False
-    df["Start_type"] = ""
-    s_map = {s["date"].normalize(): s["type"] for s in nstarts}
-    mask = df["Date"].dt.normalize().isin(s_map.keys())
-    df.loc[mask, "Is_Start"] = True
-    df.loc[mask, "Start_type"] = df.loc[mask, "Date"].dt.normalize().map(s_map)
+    s_days = np.array([s["date"] for s in nstarts], dtype="datetime64[ns]")
+    rows, query = _lookup_rows(build_date_index(df), s_days)
+    is_start = np.zeros(len(df), dtype=bool)
+    is_start[rows] = True
+    start_type = np.full(len(df), "", dtype=object)
+    start_type[rows] = np.array([s["type"] for s in nstarts], dtype=object)[query]
+    df["Is_Start"] = is_start
+    df["Start_type"] = start_type
 
     # phases
     first_main, last_main = _first_last_main_dates_from_norm(nstarts)
-    if first_main is not None:
-        df["Phase"] = np.where(df["Date"] < first_main, "Preparatory", "Competition")
-    else:
-        df["Phase"] = "Preparatory"
+    df["Phase"] = _phases(df["Date"].to_numpy(dtype="datetime64[ns]"), first_main)
 
     # TRIM to last main
     if last_main is not None:
         df = df[df["Date"] <= last_main].copy()
 
-    # Backward-compatible 'Type'
-    if 'Type' not in df.columns:
-        df['Type'] = ''
-    df.loc[df['Is_Start'], 'Type'] = df.loc[df['Is_Start'], 'Start_type']
-
+    _set_type_column(df, df["Is_Start"].to_numpy(), df["Start_type"].to_numpy(dtype=object))
     return df
 
+# ===============================
+# BaseCalendar: the base as arrays
+# ===============================
+class BaseCalendar:
+    """The base calendar normalized once into NumPy arrays; the program stages work on these.
+
+    zones: C-contiguous float64 matrix, days × ZONE_COLS (zone columns missing from the file
+    stay 0 and are not written out; zone_cols lists the present ones, zone_pos their positions).
+    dates / days: datetime64[ns] per row, days normalized; date_index: sorted-day lookup
+    (build_date_index); week: week number from the first day (0-based); themes / zone_mult: week
+    themes and the theme × focus-day multiplier matrix; is_start / start_type: start flags read
+    from the file. frame is the loaded DataFrame, used only to assemble output rows.
+    """
+
+    def __init__(self, frame, focus_pattern=None):
+        if focus_pattern is None:
+            focus_pattern = derive_focus_pattern(frame)
+        self.frame = frame
+        self.n = len(frame)
+        self.zone_cols = [c for c in ZONE_COLS if c in frame.columns]
+        self.zone_pos = [ZONE_COLS.index(c) for c in self.zone_cols]
+        self.zones = np.zeros((self.n, len(ZONE_COLS)))
+        self.zones[:, self.zone_pos] = frame[self.zone_cols].to_numpy(dtype=float)
+        self.dates = frame["Date"].to_numpy(dtype="datetime64[ns]")
+        self.date_index = build_date_index(frame)
+        self.days = frame["Date"].dt.normalize().to_numpy(dtype="datetime64[ns]")
+        self.week = _week_index(frame, frame["Date"].min()).to_numpy()
+        self.is_start = frame["Is_Start"].to_numpy(dtype=bool)
+        self.start_type = frame["Start_type"].to_numpy(dtype=object)
+        themes = assign_week_theme(frame, frame["Date"].min())
+        self.themes = themes.to_numpy()
+        # multipliers come from the full calendar (focus days depend on whole weeks)
+        weeks = frame[["Date"]].assign(Week_theme=self.themes)
+        self.zone_mult = theme_multipliers(themes) * focus_day_multipliers(
+            weeks, focus_mult_hi=focus_pattern["focus_mult_hi"], focus_mult_lo=focus_pattern["focus_mult_lo"])
+
+    def positions(self, days):
+        """Row positions for each of `days` as (rows, query) pairs (see _lookup_rows)."""
+        return _lookup_rows(self.date_index, days)
+
+def _calendar(base):
+    # prepare_base() builds the calendar; hand-assembled base dicts get one on the fly
+    cal = base.get("calendar")
+    return BaseCalendar(base["base_df"], base["focus_pattern"]) if cal is None else cal
+
 # ===============================
 # PUBLIC: generate_program
 # ===============================
-def generate_program(vo2max, starts, seed=42, scale_base_vo2=65, base_path=None):
-    random.seed(seed)
-    np.random.seed(seed)
+def prepare_base(base_path, profiler=None):
+    """Load the base calendar and derive its statistics once, so many programs can reuse them."""
+    prof = profiler or StageProfiler()
+    with prof.stage("load_base") as rec:
+        base_df = load_base(base_path)
+        rec["rows"] = len(base_df)
+    base = {"base_df": base_df}
+    for key, name, fn in [("taper_profile", "derive_taper_profile", lambda: derive_taper_profile(base_df, window_days=7)),
+                          ("focus_pattern", "derive_focus_pattern", lambda: derive_focus_pattern(base_df)),
+                          ("tercile_mult", "derive_prep_tercile_multipliers", lambda: derive_prep_tercile_multipliers(base_df))]:
+        with prof.stage(name) as rec:
+            base[key] = fn()
+            rec["rows"] = len(base_df)
+    with prof.stage("base_calendar") as rec:
+        base["calendar"] = BaseCalendar(base_df, base["focus_pattern"])
+        rec["rows"] = len(base_df)
+    return base
+
+def prep_multipliers(n, tercile_mult, weighting="terciles"):
+    """n × ZONE_COLS emphasis multipliers for n consecutive preparatory rows.
+
+    weighting: "terciles" – hard early/mid/late thirds (np.array_split); "smooth" – each row's
+    phase fraction interpolates linearly between the tercile centres (1/6, 1/2, 5/6), flat outside.
+    """
+    T = tercile_matrix(tercile_mult)
+    if weighting == "terciles":
+        return T[tercile_labels(n)]
+    if weighting == "smooth":
+        frac = (np.arange(n) + 0.5) / max(n, 1)
+        W = np.column_stack([np.interp(frac, [1/6, 1/2, 5/6], e) for e in np.eye(3)])
+        return W @ T
+    raise ValueError(f"Unknown prep weighting: {weighting!r} (use 'terciles' or 'smooth')")
+
+def _program_plan(base, starts, taper_days, prof=None, prep_weighting="terciles"):
+    """Everything a program needs from its start list, derived once: normalized starts, the kept
+    base positions (trimmed to the last main start), preparatory emphasis and the taper profile."""
+    prof = prof or StageProfiler()
+    cal = _calendar(base)
+    with prof.stage("taper_profile") as rec:
+        taper_profile = _taper_profile(base, taper_days)
+        rec["rows"] = cal.n
+    nstarts = _normalize_starts(starts)
+    first_main, last_main = _first_last_main_dates_from_norm(nstarts)
+    kept = np.arange(cal.n) if last_main is None else np.flatnonzero(cal.dates <= np.datetime64(last_main))
+    prep = kept if first_main is None else kept[cal.dates[kept] < np.datetime64(first_main)]
+    return {
+        "cal": cal, "nstarts": nstarts, "first_main": first_main, "kept": kept,
+        "prep": prep, "prep_mult": prep_multipliers(len(prep), base["tercile_mult"], prep_weighting),
+        "s_days": np.array([st["date"] for st in nstarts], dtype="datetime64[ns]"),
+        "s_types": np.array([st["type"] for st in nstarts], dtype=object),
+        "taper_profile": taper_profile, "taper_days": taper_days,
+    }
+
+def _build_program(plan, vo2max, rng, scale_base_vo2=65, pos=None, acwr_band=None, prof=None):
+    """Program rows at base positions pos (default: all kept rows), computed on the calendar's
+    days × zone matrix; the DataFrame is assembled only at the end."""
+    prof = prof or StageProfiler()
+    cal, nstarts, s_days, s_types = plan["cal"], plan["nstarts"], plan["s_days"], plan["s_types"]
+    pos = plan["kept"] if pos is None else np.asarray(pos)
+    local = np.full(cal.n, -1)
+    local[pos] = np.arange(len(pos))  # base position → program row
+
+    def rows_of(days):
+        rows, query = cal.positions(days)
+        rows = local[rows]
+        return rows[rows >= 0], query[rows >= 0]
+
+    # VO2-scaled base with week themes and focus days (one multiplier matrix)
+    with prof.stage("vo2_theme_focus") as rec:
+        vo2_scale = float(vo2max) / float(scale_base_vo2)
+        Z = cal.zones[pos] * vo2_scale
+        Z *= cal.zone_mult[pos]
+        rec["rows"] = len(pos)
+
+    # Start flags and phases
+    with prof.stage("finalize_phases_and_trim") as rec:
+        rows, query = rows_of(s_days)
+        is_start = np.zeros(len(pos), dtype=bool)
+        is_start[rows] = True
+        start_type = np.full(len(pos), "", dtype=object)
+        start_type[rows] = s_types[query]
+        phase = _phases(cal.dates[pos], plan["first_main"])
+        rec["rows"] = len(pos)
+
+    # Preparatory terciles emphasis: one multiply over the preparatory rows present
+    with prof.stage("prep_terciles") as rec:
+        r = local[plan["prep"]]
+        Z[r[r >= 0]] *= plan["prep_mult"][r >= 0]
+        rec["rows"] = int((r >= 0).sum())
+
+    # Taper: strictly follow base N-day profile before each start; the last (start, offset) wins
+    with prof.stage("taper_apply_profile") as rec:
+        rows, values = _taper_targets(rows_of, s_days, plan["taper_profile"], cal.zone_cols, vo2_scale,
+                                      plan["taper_days"])
+        Z[np.ix_(rows, cal.zone_pos)] = values
+        rec["rows"] = len(rows)
+
+    # Start days: Zone 5 ≈ 10–15 min, others minimal; one row of draws per start
+    with prof.stage("enforce_start_day_rules") as rec:
+        type_rows = np.zeros(len(pos), dtype=bool)
+        if len(nstarts):
+            draws = _start_day_draws(rng, len(nstarts))
+            rows, query = rows_of(s_days)
+            for j, (c, _, _) in enumerate(START_DAY_RANGES):
+                if c in cal.zone_cols:
+                    Z[rows, ZONE_COLS.index(c)] = draws[query, j]
+            is_start[rows] = True
+            _fill_start_types(start_type, rows, query, s_types)
+            type_rows[rows] = True
+        rec["rows"] = int(type_rows.sum())
+
+    # Days_to_next_start + Next_start_type (s_days is already sorted and unique)
+    with prof.stage("days_to_next_start") as rec:
+        to_next, next_type = _next_start(cal.days[pos], s_days, s_types)
+        rec["rows"] = len(pos)
+
+    # Keep ACWR in band; taper windows and start days stay as built
+    report = None
+    if acwr_band is not None:
+        with prof.stage("acwr_constrain") as rec:
+            frozen = to_next <= plan["taper_days"]
+            row_scale, report = acwr_row_scale(cal.dates[pos], Z[:, cal.zone_pos].sum(axis=1), frozen=frozen,
+                                               band=acwr_band)
+            Z[:, cal.zone_pos] *= row_scale[:, None]
+            rec.update(report, rows=len(pos))
+
+    with prof.stage("round_zones") as rec:
+        # Ensure non-negative & small rounding
+        Z = np.round(np.clip(Z, 0.0, None), 1)
+        rec["rows"] = len(pos)
+
+    with prof.stage("build_frame") as rec:
+        df = cal.frame.iloc[pos].drop(columns=["Week"], errors="ignore")
+        df[cal.zone_cols] = Z[:, cal.zone_pos]
+        df["Is_Start"] = is_start
+        df["Start_type"] = start_type
+        df["Week_theme"] = cal.themes[pos]
+        df["Phase"] = phase
+        _set_type_column(df, type_rows, start_type)
+        df["Days_to_next_start"] = to_next
+        df["Next_start_type"] = next_type
+        if report is not None:
+            df.attrs["acwr"] = report
+        rec["rows"] = len(df)
+    return df
 
-    # base & stats
-    base_df = load_base(base_path)
-    taper_profile = derive_taper_profile(base_df, window_days=7)
-    focus_pattern = derive_focus_pattern(base_df)
-    tercile_mult = derive_prep_tercile_multipliers(base_df)
+# ===============================
+# Compact representation (opt-in)
+# ===============================
+LABEL_COLS = ["Start_type", "Next_start_type", "Phase", "Week_theme", "Type"]
 
-    # start from base calendar skeleton (keeping dates & baseline structure)
-    df = base_df.copy()
+def compact_program(df, zones="float32"):
+    """Smaller dtypes for holding many programs in memory.
 
-    # scale zones by VO2
-    vo2_scale = float(vo2max) / float(scale_base_vo2)
-    for col in ["Zone 1","Zone 2","Zone 3","Zone 4","Zone 5","Strength"]:
-        if col in df.columns:
-            df[col] = df[col] * vo2_scale
-
-    # themes
-    themes = assign_week_theme(df, df["Date"].min())
-    df = adjust_by_theme(df, themes)
-    df["Week_theme"] = themes.values
-
-    # Focus days (concentrate HI work weekly)
-    df = enforce_focus_days(df, focus_mult_hi=focus_pattern["focus_mult_hi"],
-                               focus_mult_lo=focus_pattern["focus_mult_lo"])
-
-    # Phase split & trim to last main
-    df = _finalize_phases_and_trim(df, starts)
-
-    # Preparatory terciles emphasis
-    if (df["Phase"]=="Preparatory").any():
-        first_main_date = df.loc[df["Phase"]=="Competition","Date"].min()
-        prep_mask = df["Phase"]=="Preparatory"
-        prep_idx = df[prep_mask].index.tolist()
-        if prep_idx:
-            # split indices into 3 parts
-            parts = np.array_split(prep_idx, 3)
-            for i, key in enumerate(["early","mid","late"]):
-                mult = tercile_mult[key]
-                idxs = parts[i] if i < len(parts) else []
-                for z_key, col in [("Z1","Zone 1"),("Z2","Zone 2"),("Z3","Zone 3"),("Z4","Zone 4"),("Z5","Zone 5"),("S","Strength")]:
-                    if col in df.columns and len(idxs)>0:
-                        df.loc[idxs, col] = df.loc[idxs, col] * mult[z_key]
-
-    # Taper: strictly follow base 7-day profile before each start
-    nstarts = _normalize_starts(starts)
-    df = taper_apply_profile(df, nstarts, taper_profile, vo2_scale=vo2_scale, window_days=7)
-
-    # Enforce start day rules (Zone 5 ≈ 10–15 min)
-    df = enforce_start_day_rules(df, nstarts)
-
-    # Days_to_next_start + Start_type forward fill
-    df["Days_to_next_start"] = np.nan
-    df["Start_type"] = df["Start_type"].fillna("")
-    future_starts = [pd.to_datetime(s["date"]).normalize() for s in nstarts]
-    future_types  = [s["type"] for s in nstarts]
-    for i, row in df.iterrows():
-        deltas = [(d - row["Date"].normalize()).days for d in future_starts if (d - row["Date"].normalize()).days >= 0]
-        if deltas:
-            dmin = min(deltas)
-            df.at[i, "Days_to_next_start"] = dmin
-
-    # Ensure non-negative & small rounding
-    for c in ["Zone 1","Zone 2","Zone 3","Zone 4","Zone 5","Strength"]:
-        if c in df.columns:
-            df[c] = df[c].clip(lower=0.0)
-            df[c] = np.round(df[c], 1)
+    zones: "float32" (minutes) or "int16" (tenths of minutes; df.attrs["zone_scale"] = 10).
+    Label columns become categoricals, Day_index int32 and Days_to_next_start float32.
+    expand_program() restores float64 minutes and the original label dtypes (kept in
+    df.attrs["label_dtypes"]); values equal the rounded originals.
+    """
+    out = df.copy()
+    out.attrs["label_dtypes"] = {c: str(df[c].dtype) for c in LABEL_COLS
+                                 if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype)}
+    for c in ZONE_COLS:
+        if c not in out.columns:
+            continue
+        if zones == "int16":
+            tenths = np.round(out[c].to_numpy(dtype=float) * 10)
+            if np.abs(tenths).max(initial=0) > np.iinfo(np.int16).max:
+                raise ValueError(f"{c}: values too large for int16 tenths of minutes")
+            out[c] = tenths.astype(np.int16)
+        elif zones == "float32":
+            out[c] = out[c].astype(np.float32)
+        else:
+            raise ValueError(f"Unknown zones dtype: {zones!r} (use 'float32' or 'int16')")
+    for c in LABEL_COLS:
+        if c in out.columns:
+            out[c] = out[c].astype("category")
+    if "Day_index" in out.columns:
+        out["Day_index"] = out["Day_index"].astype(np.int32)
+    if "Days_to_next_start" in out.columns:
+        out["Days_to_next_start"] = out["Days_to_next_start"].astype(np.float32)
+    out.attrs["zone_scale"] = 10 if zones == "int16" else 1
+    return out
 
-    return df
+def expand_program(df):
+    """Undo compact_program(): float64 minutes (rounded to 0.1) and label columns in their original
+    dtype (object if unknown, e.g. for frames compacted before label_dtypes was recorded)."""
+    out = df.copy()
+    scale = out.attrs.pop("zone_scale", 1)
+    label_dtypes = out.attrs.pop("label_dtypes", {})
+    out.attrs.pop("compact", None)
+    for c in ZONE_COLS:
+        if c in out.columns:
+            out[c] = np.round(out[c].to_numpy(dtype=float) / scale, 1)
+    for c in LABEL_COLS:
+        if c in out.columns and isinstance(out[c].dtype, pd.CategoricalDtype):
+            out[c] = out[c].astype(label_dtypes.get(c, object))
+    if "Day_index" in out.columns:
+        out["Day_index"] = out["Day_index"].astype(np.int64)
+    if "Days_to_next_start" in out.columns:
+        out["Days_to_next_start"] = out["Days_to_next_start"].astype(float)
+    return out
+
+def memory_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+def _taper_profile(base, taper_days):
+    # prepare_base() derives the default 7-day profile; longer tapers are derived on demand
+    # unless the caller pre-derived them into base["taper_profiles"] (see sweep.py)
+    if taper_days == 7:
+        return base["taper_profile"]
+    if taper_days in base.get("taper_profiles", {}):
+        return base["taper_profiles"][taper_days]
+    return derive_taper_profile(base["base_df"], window_days=taper_days)
+
+def generate_program(vo2max, starts, seed=42, scale_base_vo2=65, base_path=None, base=None, taper_days=7,
+                     profile=None, compact=None, acwr_band=None, prep_weighting="terciles", profile_memory=True):
+    """seed: int or numpy Generator; the pipeline draws only from its own
+    np.random.default_rng(seed), so equal inputs give equal output under any concurrency.
+    base: optional result of prepare_base(); when given, base_path is not read again.
+    taper_days: length of the taper window before each start (7, 14 or 21).
+    profile: optional callback, called once per pipeline stage with a record
+    {'stage', 'seconds', 'rows', 'peak_mb'} (see profiling.StageProfiler).
+    profile_memory: with a profile callback, also trace peak memory (tracemalloc; several
+    times slower and process-wide). False records time and rows only.
+    compact: None, "float32" or "int16" to return compact_program() dtypes; the sizes are
+    kept in df.attrs['compact'] ({'zones', 'bytes_before', 'bytes_after'}) and in the
+    'compact' stage record.
+    acwr_band: optional (lo, hi); daily loads outside taper windows and start days are
+    rescaled so the rolling 7:28 ACWR stays in the band (acwr_model.constrain_acwr).
+    The solver report is kept in df.attrs['acwr'].
+    prep_weighting: "terciles" (hard thirds) or "smooth" emphasis over the preparatory phase
+    (see prep_multipliers)."""
+    prof = StageProfiler(profile, memory=profile_memory)
+    try:
+        df = _generate_program(vo2max, starts, seed, scale_base_vo2, base_path, base, taper_days, prof, acwr_band,
+                               prep_weighting)
+        if compact:
+            with prof.stage("compact") as rec:
+                rec["bytes_before"] = memory_bytes(df)
+                df = compact_program(df, zones=compact)
+                rec["bytes_after"] = memory_bytes(df)
+                rec["rows"] = len(df)
+                df.attrs["compact"] = {"zones": compact, "bytes_before": rec["bytes_before"],
+                                       "bytes_after": rec["bytes_after"]}
+        return df
+    finally:
+        prof.close()
+
+def _generate_program(vo2max, starts, seed, scale_base_vo2, base_path, base, taper_days, prof, acwr_band=None,
+                      prep_weighting="terciles"):
+    rng = np.random.default_rng(seed)
+    if base is None:
+        base = prepare_base(base_path, profiler=prof)
+    plan = _program_plan(base, starts, taper_days, prof, prep_weighting)
+    return _build_program(plan, vo2max, rng, scale_base_vo2, acwr_band=acwr_band, prof=prof)
+
+def regenerate_program(prev, old_starts, new_starts, vo2max, seed=42, scale_base_vo2=65, base_path=None, base=None,
+                       taper_days=7, acwr_band=None, prep_weighting="terciles"):
+    """Patch a previous generate_program() result after the start list changed from old_starts to new_starts.
+
+    prev must come from generate_program(vo2max, old_starts, seed, scale_base_vo2, taper_days, prep_weighting)
+    on the same base.
+    Only taper windows and start days of added/removed starts, all start days (start-day values are
+    drawn in start order) and rows added by a later last main start are rebuilt; the result equals a
+    full generate_program() call with new_starts. If the first main start moves, the preparatory
+    terciles shift everywhere and the program is regenerated in full; so is an ACWR-constrained
+    program (acwr_band), since the rescaling depends on the whole season.
+    """
+    if base is None:
+        base = prepare_base(base_path)
+    old_n, new_n = _normalize_starts(old_starts), _normalize_starts(new_starts)
+    first_main, last_main = _first_last_main_dates_from_norm(new_n)
+    if acwr_band is not None or _first_last_main_dates_from_norm(old_n)[0] != first_main:
+        return generate_program(vo2max, new_starts, seed=seed, scale_base_vo2=scale_base_vo2, base=base,
+                                taper_days=taper_days, acwr_band=acwr_band, prep_weighting=prep_weighting)
+
+    base_df = base["base_df"]
+    plan = _program_plan(base, new_starts, taper_days, prep_weighting=prep_weighting)
+    keep = base_df.index[plan["kept"]]
+    changed = {(s["date"], s["type"]) for s in old_n} ^ {(s["date"], s["type"]) for s in new_n}
+    days = {s["date"] for s in new_n}
+    for d, _ in changed:
+        days.update(d - timedelta(days=k) for k in range(taper_days+1))
+    day = base_df.loc[keep, "Date"].dt.normalize()
+    affected = keep[day.isin(days).to_numpy() | ~keep.isin(prev.index)]
+    sub = _build_program(plan, vo2max, np.random.default_rng(seed), scale_base_vo2,
+                         pos=base_df.index.get_indexer(affected))
+
+    rest = prev.loc[prev.index.intersection(keep).difference(affected)]
+    # an empty sub would turn the (empty) string columns into object dtype
+    df = (pd.concat([rest, sub]) if len(sub) else rest.copy()).reindex(keep)
+    nxt = days_to_next_start(df["Date"], new_n)
+    df["Days_to_next_start"] = nxt["Days_to_next_start"]
+    df["Next_start_type"] = nxt["Next_start_type"]
+    return df[prev.columns]
+
+def iter_program_weeks(vo2max, starts, seed=42, scale_base_vo2=65, base_path=None, base=None, taper_days=7,
+                       prep_weighting="terciles", profile=None, profile_memory=True):
+    """Yield (week, frame) for the program of generate_program(), one 7-day week at a time.
+
+    Weeks are counted from the first base day (Week 1 = days 0–6, as in weekplan). Global
+    inputs (base statistics, taper profile, themes and focus days, preparatory terciles and
+    start-day draws) are derived up front; each week is then built from its own rows only,
+    so pd.concat(frame for _, frame in iter_program_weeks(...)) equals generate_program(...)
+    up to row order: for a base not sorted by date, reindex the concatenation to the
+    base_df index (generate_program keeps base order).
+    acwr_band is not supported here: the ACWR solver needs the whole season.
+    profile, profile_memory: as in generate_program; the stages of each week's build carry 'week'.
+    """
+    prof = StageProfiler(profile, memory=profile_memory)
+    try:
+        if base is None:
+            base = prepare_base(base_path, profiler=prof)
+        plan = _program_plan(base, starts, taper_days, prof, prep_weighting)
+        kept = plan["kept"]
+        # every week replays the same start-day draws (one row per start, see enforce_start_day_rules)
+        rng = np.random.default_rng(seed)
+        rng_state = rng.bit_generator.state
+
+        week = plan["cal"].week[kept] + 1
+        order = np.argsort(week, kind="stable")
+        for pos in np.split(order, np.flatnonzero(np.diff(week[order])) + 1):
+            if not len(pos):
+                continue
+            w = int(week[pos[0]])
+            week_prof = StageProfiler(profile and (lambda rec, w=w: profile(dict(rec, week=w))), memory=profile_memory)
+            rng.bit_generator.state = rng_state
+            try:
+                frame = _build_program(plan, vo2max, rng, scale_base_vo2, pos=kept[pos], prof=week_prof)
+            finally:
+                week_prof.close()
+            yield w, frame
+    finally:
+        prof.close()
+
+# ===============================
+# PUBLIC: generate_programs_batch
+# ===============================
+def ensure_base(base):
+    """A prepare_base() result: dicts pass through, a path / bytes / file object (or None) is prepared."""
+    return base if isinstance(base, dict) else prepare_base(base)
+
+def with_taper_profiles(base, taper_days):
+    """Copy of base with the taper profile of every length in taper_days derived up front
+    (base["taper_profiles"]), so workers do not derive them again per program."""
+    base = ensure_base(base)
+    return dict(base, taper_profiles={int(k): _taper_profile(base, int(k)) for k in taper_days})
+
+_WORKER_BASE = None
+
+def _init_batch_worker(base):
+    global _WORKER_BASE
+    _WORKER_BASE = base
+
+def _call_with_worker_base(fn, item):
+    return fn(item, _WORKER_BASE)
+
+def map_with_base(fn, items, base=None, executor="process", max_workers=None, window=None, chunksize=1):
+    """Yield fn(item, base) for each item, in item order, against one prepared base.
+
+    base: base file path / bytes or the result of prepare_base() (see ensure_base); with
+    executor="process" it is sent to each worker once (pool initializer), not with every task,
+    so fn must be a module-level function there.
+    executor: "process", "thread" or None (serially in this process, one item at a time).
+    window: at most this many items in flight ahead of the consumer, which bounds the memory
+    held by finished results; None submits everything up front (chunksize applies then).
+    """
+    base = ensure_base(base)
+    items = list(items)
+    if executor is None or len(items) <= 1:
+        for item in items:
+            yield fn(item, base)
+        return
+    if executor == "process":
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_batch_worker, initargs=(base,))
+        call = partial(_call_with_worker_base, fn)
+    elif executor == "thread":
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        call = lambda item: fn(item, base)  # noqa: E731
+    else:
+        raise ValueError(f"Unknown executor: {executor!r} (use 'process', 'thread' or None)")
+    with pool:
+        if window is None:
+            yield from pool.map(call, items, chunksize=chunksize)
+            return
+        todo = iter(items)
+        pending = deque(pool.submit(call, item) for item in islice(todo, window))
+        while pending:
+            fut = pending.popleft()
+            for item in islice(todo, 1):
+                pending.append(pool.submit(call, item))
+            yield fut.result()
+
+def generate_for_athlete(athlete, base):
+    """generate_program() for one athlete dict of generate_programs_batch against a prepared base."""
+    return generate_program(
+        athlete["vo2max"], athlete.get("starts", []),
+        seed=athlete.get("seed", 42),
+        scale_base_vo2=athlete.get("scale_base_vo2", 65),
+        taper_days=athlete.get("taper_days", 7),
+        compact=athlete.get("compact"),
+        acwr_band=athlete.get("acwr_band"),
+        prep_weighting=athlete.get("prep_weighting", "terciles"),
+        base=base,
+    )
+
+def generate_programs_batch(athletes, base=None, executor="process", max_workers=None, long=False, compact=None):
+    """Generate programs for a squad against one base calendar.
+
+    athletes: [{'vo2max', 'starts', 'seed', optional 'scale_base_vo2', 'taper_days', 'acwr_band',
+                'prep_weighting', 'name'}, ...]
+    base: base file path or the result of prepare_base(); statistics are derived only once.
+    executor: "process", "thread" or None (run serially in this process); see map_with_base.
+    compact: None, "float32" or "int16" (see compact_program), unless an athlete sets 'compact'.
+    Returns a list of DataFrames (athlete order) or, with long=True, one frame
+    with an 'Athlete' column (athlete 'name' or its position).
+    """
+    athletes = [a if compact is None or "compact" in a else dict(a, compact=compact) for a in athletes]
+    results = list(map_with_base(generate_for_athlete, athletes, base, executor, max_workers))
+
+    if not long:
+        return results
+    keys = [a.get("name", i) for i, a in enumerate(athletes)]
+    if not results:
+        return pd.DataFrame()
+    out = pd.concat([r.assign(Athlete=k) for k, r in zip(keys, results)], ignore_index=True)
+    if any(r.attrs.get("zone_scale") for r in results):
+        # categoricals with differing categories concat to object; re-categorize the long frame
+        for c in LABEL_COLS + ["Athlete"]:
+            if c in out.columns:
+                out[c] = out[c].astype("category")
+        out.attrs["zone_scale"] = results[0].attrs.get("zone_scale", 1)
+    return out
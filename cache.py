@@ -0,0 +1,214 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from biathlon_program_generator_segments_taper_v2 import _normalize_starts, generate_program, prepare_base, regenerate_program
+
+
+class LRUCache:
+    """Size-bounded in-memory LRU cache with an optional on-disk pickle tier.
+
+    max_items: entries kept in memory; disk_dir: directory for the disk tier (None = memory only);
+    max_disk_bytes: total size of the disk tier, least recently used files are removed first.
+    """
+
+    def __init__(self, max_items=8, disk_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return self._mem[key]
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._mem_put(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._mem_put(key, value)
+        self._disk_put(key, value)
+        return value
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._mem.clear()
+            self.hits = self.misses = 0
+        if disk and self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "items": len(self._mem), "max_items": self.max_items}
+
+    def __contains__(self, key):
+        return key in self._mem or bool(self.disk_dir and os.path.exists(self._path(key)))
+
+    def _mem_put(self, key, value):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # mark as recently used
+            return value
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._disk_evict()
+
+    def _disk_evict(self):
+        if not self.max_disk_bytes:
+            return
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".pkl"):
+                st = os.stat(os.path.join(self.disk_dir, name))
+                files.append((st.st_mtime, st.st_size, name))
+        total = sum(f[1] for f in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+
+def _cache_dir(sub):
+    root = os.environ.get("BIATHLON_CACHE_DIR")
+    return os.path.join(root, sub) if root else None
+
+
+# Normalized base frames + derived profiles, keyed by the SHA-256 of the base file bytes
+BASE_CACHE = LRUCache(max_items=8, disk_dir=_cache_dir("base"))
+# Finished programs, keyed by base hash + normalized starts + scalar parameters
+PROGRAM_CACHE = LRUCache(max_items=32, disk_dir=_cache_dir("programs"))
+# Bump when generate_program output changes, so stale disk entries are not served
+PROGRAM_CACHE_VERSION = 2
+
+
+def source_bytes(source):
+    """Raw bytes of a base file given as a path, bytes or a file-like object (e.g. a Streamlit upload)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    if hasattr(source, "read"):
+        pos = source.tell() if hasattr(source, "tell") else None
+        data = source.read()
+        if pos is not None:
+            source.seek(pos)
+        return data
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def file_sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cached_base(source, cache=None):
+    """prepare_base() result for a base file, cached by content hash. Treat the result as read-only."""
+    data = source_bytes(source)
+    return _cached_base(data, file_sha256(data), cache)
+
+
+def _cached_base(data, sha, cache=None):
+    cache = BASE_CACHE if cache is None else cache
+    key = "base-" + sha
+    base = cache.get(key)
+    if base is None:
+        base = cache.put(key, prepare_base(io.BytesIO(data)))
+    return base
+
+
+def program_key(base_sha, vo2max, starts, seed=42, scale_base_vo2=65, taper_days=7, acwr_band=None,
+                prep_weighting="terciles"):
+    """Cache key for one generate_program call: base file hash, normalized starts and scalar parameters."""
+    sig = {
+        "v": PROGRAM_CACHE_VERSION,
+        "base": base_sha,
+        "starts": [[s["date"].isoformat(), s["type"]] for s in _normalize_starts(starts)],
+        "vo2max": float(vo2max),
+        "seed": int(seed),
+        "scale_base_vo2": float(scale_base_vo2),
+        "taper_days": int(taper_days),
+        "acwr_band": None if acwr_band is None else [float(b) for b in acwr_band],
+        "prep_weighting": prep_weighting,
+    }
+    return "program-" + hashlib.sha256(json.dumps(sig, sort_keys=True).encode()).hexdigest()
+
+
+def cached_generate_program(vo2max, starts, seed=42, scale_base_vo2=65, base_path=None, cache=None, base_cache=None,
+                            previous=None, taper_days=7, profile=None, acwr_band=None, prep_weighting="terciles",
+                            profile_memory=True):
+    """Memoized generate_program; base_path may be a path, bytes or file-like. Returns a fresh copy.
+
+    previous: optional (prev_df, prev_starts) from a call with the same base and scalar parameters;
+    on a cache miss the program is patched with regenerate_program() instead of built in full.
+    profile, profile_memory: stage callback and memory tracing passed to generate_program
+    (no records on cache hits or incremental patches).
+    """
+    cache = PROGRAM_CACHE if cache is None else cache
+    data = source_bytes(base_path)
+    sha = file_sha256(data)
+    key = program_key(sha, vo2max, starts, seed=seed, scale_base_vo2=scale_base_vo2, taper_days=taper_days,
+                      acwr_band=acwr_band, prep_weighting=prep_weighting)
+    df = cache.get(key)
+    if df is None:
+        base = _cached_base(data, sha, base_cache)
+        if previous is not None:
+            prev_df, prev_starts = previous
+            df = regenerate_program(prev_df, prev_starts, starts, vo2max, seed=seed, scale_base_vo2=scale_base_vo2,
+                                    base=base, taper_days=taper_days, acwr_band=acwr_band,
+                                    prep_weighting=prep_weighting)
+        else:
+            df = generate_program(vo2max, starts, seed=seed, scale_base_vo2=scale_base_vo2, base=base,
+                                  taper_days=taper_days, profile=profile, profile_memory=profile_memory,
+                                  acwr_band=acwr_band, prep_weighting=prep_weighting)
+        cache.put(key, df)
+    return df.copy()
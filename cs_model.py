@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 def compute_cs(tt_results):
     """
     Изчислява Critical Speed от два теста.
@@ -6,3 +9,58 @@ def compute_cs(tt_results):
     d1, d2 = tt_results
     cs = (d2["distance"] - d1["distance"]) / (d2["time"] - d1["time"])  # m/s
     return {"cs": cs * 3.6}  # km/h
+
+def fit_cs(tt_results):
+    """
+    CS и D' от N ≥ 2 теста по метода на най-малките квадрати (модел дистанция–време: d = CS·t + D').
+    tt_results: [{'distance': m, 'time': s}, ...]
+    Връща {'cs' (km/h), 'cs_ms', 'd_prime' (m), 'r2', 'see' (m), 'se_cs_ms', 'se_d_prime', 'n'}.
+    """
+    df = pd.DataFrame(list(tt_results), columns=["distance", "time"]).assign(Athlete=0)
+    rec = fit_cs_batch(df).iloc[0]
+    out = {k: float(rec[k]) for k in ["cs", "cs_ms", "d_prime", "r2", "see", "se_cs_ms", "se_d_prime"]}
+    out["n"] = int(rec["n"])
+    return out
+
+def fit_cs_batch(df: pd.DataFrame, athlete_col="Athlete", distance_col="distance", time_col="time"):
+    """
+    Напасване на CS и D' за цял отбор наведнъж (без цикъл по спортисти).
+    df: един ред на тест – спортист, дистанция (m), време (s).
+    Връща по един ред на спортист: n, cs (km/h), cs_ms, d_prime, r2, see, se_cs_ms, se_d_prime.
+    При по-малко от 2 теста или еднакви времена стойностите са NaN; see/se изискват ≥ 3 теста.
+    """
+    d = df[[athlete_col, distance_col, time_col]].dropna()
+    codes, athletes = pd.factorize(d[athlete_col], sort=True)
+    k = len(athletes)
+    t = d[time_col].to_numpy(dtype=float)
+    x = d[distance_col].to_numpy(dtype=float)
+
+    n = np.bincount(codes, minlength=k).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_mean = np.bincount(codes, t, k) / n
+        x_mean = np.bincount(codes, x, k) / n
+        dt, dx = t - t_mean[codes], x - x_mean[codes]
+        stt = np.bincount(codes, dt * dt, k)
+        stx = np.bincount(codes, dt * dx, k)
+        sxx = np.bincount(codes, dx * dx, k)
+
+        ok = (n >= 2) & (stt > 0)
+        cs = np.where(ok, stx / stt, np.nan)
+        d_prime = x_mean - cs * t_mean
+        ss_res = np.bincount(codes, (x - (cs[codes] * t + d_prime[codes])) ** 2, k)
+        r2 = np.where(ok & (sxx > 0), 1.0 - ss_res / sxx, np.nan)
+        see = np.where(ok & (n > 2), np.sqrt(ss_res / (n - 2)), np.nan)
+        se_cs = see / np.sqrt(stt)
+        se_d_prime = see * np.sqrt(1.0 / n + t_mean ** 2 / stt)
+
+    return pd.DataFrame({
+        athlete_col: athletes,
+        "n": n.astype(int),
+        "cs": cs * 3.6,  # km/h
+        "cs_ms": cs,
+        "d_prime": d_prime,
+        "r2": r2,
+        "see": see,
+        "se_cs_ms": se_cs,
+        "se_d_prime": se_d_prime,
+    })
@@ -1,15 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# Зона → диапазон от CS (min, max)
+ZONE_SPEED_FRACTIONS = {
+    1: (0.6, 0.75),
+    2: (0.76, 0.80),
+    3: (0.81, 0.88),
+    4: (0.89, 0.95),
+    5: (0.96, 1.05),
+}
+
+def _speed_bounds(zones, cs):
+    """Min/max km/h за масив от зони (NaN за непозната зона)."""
+    lut = np.full((7, 2), np.nan)
+    for z, rng in ZONE_SPEED_FRACTIONS.items():
+        lut[z] = rng
+    z = pd.to_numeric(pd.Series(zones), errors="coerce").to_numpy()
+    valid = np.isin(z, list(ZONE_SPEED_FRACTIONS))
+    bounds = lut[np.where(valid, z, 0).astype(int)]
+    return bounds[:, 0] * cs, bounds[:, 1] * cs
+
+def _format_range(lo, hi):
+    """'x-y km/h' за масиви от скорости ('' където липсва)."""
+    lo, hi = np.asarray(lo, dtype=float), np.asarray(hi, dtype=float)
+    ok = ~(np.isnan(lo) | np.isnan(hi))
+    txt = np.char.add(np.char.add(np.char.mod("%.1f", np.where(ok, lo, 0.0)), "-"),
+                      np.char.add(np.char.mod("%.1f", np.where(ok, hi, 0.0)), " km/h"))
+    return np.where(ok, txt, "").astype(object)
+
 def generate_plan(cs: float, acwr: float, base_df):
     """
     Генерира примерен план на база CS и ACWR.
     """
     plan = base_df.copy()
-    plan["Target_speed"] = plan["Zone"].map({
-        1: (0.6, 0.75),
-        2: (0.76, 0.80),
-        3: (0.81, 0.88),
-        4: (0.89, 0.95),
-        5: (0.96, 1.05)
-    }).apply(lambda rng: f"{rng[0]*cs:.1f}-{rng[1]*cs:.1f} km/h")
+    lo, hi = _speed_bounds(plan["Zone"], cs)
+    plan["Target_speed"] = _format_range(lo, hi)
     plan["ACWR_flag"] = "OK" if acwr and acwr < 1.5 else "⚠ High Load"
     return plan
 
+def prescribe_speeds(program: pd.DataFrame, cs: float):
+    """
+    Целеви скорости от CS за всеки ден на generate_program().
+    Добавя числови колони Z1_speed_min/Z1_speed_max … Z5_speed_min/Z5_speed_max (km/h)
+    до минутите по зони ('Zone 1' … 'Zone 5'); NaN за зона без минути в деня.
+    """
+    out = program.copy()
+    for z, (f_lo, f_hi) in ZONE_SPEED_FRACTIONS.items():
+        col = f"Zone {z}"
+        has = out[col].to_numpy(dtype=float) > 0 if col in out.columns else np.zeros(len(out), dtype=bool)
+        out[f"Z{z}_speed_min"] = np.where(has, f_lo * cs, np.nan)
+        out[f"Z{z}_speed_max"] = np.where(has, f_hi * cs, np.nan)
+    return out
+
+def format_speeds(program: pd.DataFrame):
+    """
+    За експорт: заменя числовите Z*_speed_min/max с текст 'x-y km/h' в колони Z1_target … Z5_target.
+    """
+    out = program.copy()
+    for z in ZONE_SPEED_FRACTIONS:
+        lo, hi = f"Z{z}_speed_min", f"Z{z}_speed_max"
+        if lo in out.columns and hi in out.columns:
+            out[f"Z{z}_target"] = _format_range(out[lo], out[hi])
+            out = out.drop(columns=[lo, hi])
+    return out
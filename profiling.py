@@ -0,0 +1,77 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger("biathlon.profile")
+
+# tracemalloc is process-global: profilers share one tracing session, reference-counted
+_TRACE_LOCK = threading.Lock()
+_tracing = {"users": 0, "owned": False}
+
+
+def _start_tracing():
+    with _TRACE_LOCK:
+        if _tracing["users"] == 0:
+            # tracing switched on by someone else is left running at the end
+            _tracing["owned"] = not tracemalloc.is_tracing()
+            if _tracing["owned"]:
+                tracemalloc.start()
+        _tracing["users"] += 1
+
+
+def _stop_tracing():
+    with _TRACE_LOCK:
+        _tracing["users"] -= 1
+        if _tracing["users"] == 0 and _tracing["owned"]:
+            tracemalloc.stop()
+            _tracing["owned"] = False
+
+
+class StageProfiler:
+    """Per-stage wall time, row count and peak memory for an opt-in pipeline callback.
+
+    callback(record) gets one dict per stage: {'stage', 'seconds', 'rows', 'peak_mb'}.
+    With memory=True, peak_mb is the traced-allocation peak above the stage's starting
+    point (tracemalloc). Tracing slows the pipeline several times over and covers the whole
+    process: allocations of other threads count, and concurrent profilers reset each other's
+    peak (values are clamped at 0). With memory=False only time and rows are recorded
+    (peak_mb is None). Tracing is reference-counted across profilers and stops when the last
+    one closes. With callback=None every stage is a no-op.
+    """
+
+    def __init__(self, callback=None, memory=True):
+        self.callback = callback
+        self.memory = memory and callback is not None
+        self._tracing = False
+        if self.memory:
+            _start_tracing()
+            self._tracing = True
+
+    @contextmanager
+    def stage(self, name):
+        rec = {"stage": name}
+        if self.callback is None:
+            yield rec
+            return
+        if self.memory:
+            tracemalloc.reset_peak()
+            mem0 = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        yield rec
+        rec["seconds"] = time.perf_counter() - t0
+        rec.setdefault("rows", None)
+        rec["peak_mb"] = max(0, tracemalloc.get_traced_memory()[1] - mem0) / 2**20 if self.memory else None
+        self.callback(rec)
+
+    def close(self):
+        if self._tracing:
+            _stop_tracing()
+            self._tracing = False
+
+
+def log_stage_record(record, log=None):
+    """Emit a stage record as one structured (JSON) log line; usable directly as profile callback."""
+    (log or logger).info(json.dumps(record, default=str), extra={"profile": record})
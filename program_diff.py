@@ -0,0 +1,185 @@
+"""Differences between generate_program() outputs, aligned on Date.
+
+    d = diff_programs(before, after)          # e.g. VO2max changed or a start moved
+    d["weekly"]; d["labels"]; d["totals"]
+
+    summary, weekly = diff_many(baseline, {"VO2 63": p63, "VO2 66": p66})
+
+Both programs are reduced to a sorted date axis, a zone-minutes matrix and label arrays;
+alignment is a union of the date axes plus searchsorted positions, and weekly sums are
+bincounts, so a multi-season program diffs in milliseconds. diff_many prepares the
+baseline once and reuses it for every scenario.
+"""
+import numpy as np
+import pandas as pd
+
+import biathlon_program_generator_segments_taper_v2 as g
+
+DIFF_LABEL_COLS = ["Phase", "Start_type", "Week_theme"]
+
+
+def _program_arrays(df, zones, labels):
+    """(dates, zone minutes, {label: values}) of a program, one entry per Date in date order.
+
+    Rows sharing a date (bases may repeat a day) are summed; labels come from the first such row.
+    """
+    dates = pd.to_datetime(df["Date"]).to_numpy().astype("datetime64[D]")
+    order = np.argsort(dates, kind="stable")
+    dates = dates[order]
+    mins = df.reindex(columns=zones).to_numpy(dtype=float)[order]
+    mins[np.isnan(mins)] = 0.0
+    labs = {}
+    for c in labels:
+        s = df[c] if c in df.columns else pd.Series("", index=df.index)
+        labs[c] = s.astype(object).where(s.notna(), "").astype(str).to_numpy(dtype=object)[order]
+    if len(dates) > 1 and (dates[1:] == dates[:-1]).any():
+        dates, first = np.unique(dates, return_index=True)
+        mins = np.add.reduceat(mins, first, axis=0) if mins.shape[1] else mins[first]
+        labs = {c: v[first] for c, v in labs.items()}
+    return dates, mins, labs
+
+
+def _align(a, b):
+    """Union date axis and both sides' arrays placed on it (missing days: 0 minutes, '' labels)."""
+    da, ma, la = a
+    db, mb, lb = b
+    if len(da) == len(db) and (da == db).all():
+        ones = np.ones(len(da), dtype=bool)
+        return da, ma, mb, la, lb, ones, ones
+    dates = np.union1d(da, db)
+    ia, ib = np.searchsorted(dates, da), np.searchsorted(dates, db)
+    n = len(dates)
+
+    def place(idx, mins, labs):
+        m = np.zeros((n, mins.shape[1]))
+        m[idx] = mins
+        out = {}
+        for c, v in labs.items():
+            out[c] = np.full(n, "", dtype=object)
+            out[c][idx] = v
+        present = np.zeros(n, dtype=bool)
+        present[idx] = True
+        return m, out, present
+
+    A, LA, in_a = place(ia, ma, la)
+    B, LB, in_b = place(ib, mb, lb)
+    return dates, A, B, LA, LB, in_a, in_b
+
+
+def _weeks(dates):
+    # Week 1 = the first 7 days of the aligned axis, as in summarize_program / weekplan
+    return ((dates - dates[0]).astype(int) // 7 + 1) if len(dates) else np.zeros(0, dtype=int)
+
+
+def _week_sums(idx, M, n_weeks):
+    return np.column_stack([np.bincount(idx, M[:, i], n_weeks) for i in range(M.shape[1])]) \
+        if M.shape[1] else np.zeros((n_weeks, 0))
+
+
+def _weekly(week, A, B, zones):
+    n_weeks = int(week.max()) if len(week) else 0
+    wa, wb = _week_sums(week - 1, A, n_weeks), _week_sums(week - 1, B, n_weeks)
+    out = pd.DataFrame(wb - wa, columns=zones)
+    out.insert(0, "Week", np.arange(1, n_weeks + 1))
+    out["Total_before"] = wa.sum(axis=1)
+    out["Total_after"] = wb.sum(axis=1)
+    out["Total_delta"] = out["Total_after"] - out["Total_before"]
+    return out
+
+
+def _label_changes(dates, week, LA, LB, both):
+    parts = []
+    for c in LA:
+        idx = np.flatnonzero(both & (LA[c] != LB[c]))
+        if len(idx):
+            parts.append(pd.DataFrame({"Date": dates[idx], "Week": week[idx], "Column": c,
+                                       "Before": LA[c][idx], "After": LB[c][idx]}))
+    if not parts:
+        return pd.DataFrame({"Date": pd.Series(dtype="datetime64[s]"), "Week": pd.Series(dtype=int),
+                             "Column": pd.Series(dtype=object), "Before": pd.Series(dtype=object),
+                             "After": pd.Series(dtype=object)})
+    out = pd.concat(parts, ignore_index=True).sort_values(["Date", "Column"], kind="stable", ignore_index=True)
+    out["Date"] = pd.to_datetime(out["Date"])
+    return out
+
+
+def _zones(*dfs):
+    return [z for z in g.ZONE_COLS if any(z in df.columns for df in dfs)]
+
+
+def diff_programs(before, after, labels=DIFF_LABEL_COLS, tol=1e-6):
+    """Compare two generate_program() results day by day (also works on exported Program sheets).
+
+    Returns a dict:
+      'daily'  – one row per date of either program: Date, Week, Presence ('both', 'before',
+                 'after'), the zone deltas (after − before), Total_before/after/delta, Changed
+      'weekly' – zone deltas and totals per week (Week 1 = first 7 days of the aligned dates)
+      'labels' – shared days whose Phase / Start_type / Week_theme differ: Date, Week, Column, Before, After
+      'totals' – per zone and 'Total': Before, After, Delta, Delta_pct
+      'counts' – days per side, days only in one program, days with changed minutes, label changes per column
+    Zone deltas smaller than tol count as unchanged. Rows sharing a date are summed into one day.
+    """
+    zones = _zones(before, after)
+    dates, A, B, LA, LB, in_a, in_b = _align(_program_arrays(before, zones, labels),
+                                             _program_arrays(after, zones, labels))
+    week = _weeks(dates)
+    delta = B - A
+    changed = (np.abs(delta) > tol).any(axis=1) if len(zones) else np.zeros(len(dates), dtype=bool)
+    both = in_a & in_b
+
+    daily = pd.DataFrame(delta, columns=zones)
+    daily.insert(0, "Date", pd.to_datetime(dates))
+    daily.insert(1, "Week", week)
+    daily.insert(2, "Presence", np.where(both, "both", np.where(in_a, "before", "after")))
+    daily["Total_before"] = A.sum(axis=1)
+    daily["Total_after"] = B.sum(axis=1)
+    daily["Total_delta"] = daily["Total_after"] - daily["Total_before"]
+    daily["Changed"] = changed | ~both
+
+    label_changes = _label_changes(dates, week, LA, LB, both)
+    sa, sb = A.sum(axis=0), B.sum(axis=0)
+    totals = pd.DataFrame({"Before": np.append(sa, sa.sum()), "After": np.append(sb, sb.sum())},
+                          index=pd.Index(zones + ["Total"], name="Zone"))
+    totals["Delta"] = totals["After"] - totals["Before"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        totals["Delta_pct"] = np.where(totals["Before"] != 0, 100 * totals["Delta"] / totals["Before"], np.nan)
+
+    counts = {"Days_before": int(in_a.sum()), "Days_after": int(in_b.sum()),
+              "Only_before": int((in_a & ~in_b).sum()), "Only_after": int((in_b & ~in_a).sum()),
+              "Days_changed": int((changed & both).sum())}
+    counts.update({f"{c}_changes": int((label_changes["Column"] == c).sum()) for c in labels})
+    return {"daily": daily, "weekly": _weekly(week, A, B, zones), "labels": label_changes,
+            "totals": totals.reset_index(), "counts": counts}
+
+
+def diff_many(baseline, scenarios, labels=DIFF_LABEL_COLS, tol=1e-6):
+    """One baseline program against many scenario programs.
+
+    scenarios: {name: program} or a list of programs (named by position).
+    Returns (summary, weekly): summary has one row per scenario with the counts of
+    diff_programs, the total delta per zone and 'Total_delta'; weekly has Scenario, Week,
+    the zone deltas and Total_delta. The baseline is converted once; scenarios on the
+    baseline's dates skip the date join.
+    """
+    if not isinstance(scenarios, dict):
+        scenarios = dict(enumerate(scenarios))
+    zones = _zones(baseline, *scenarios.values())
+    base_arrays = _program_arrays(baseline, zones, labels)
+    rows, weekly = [], []
+    for name, df in scenarios.items():
+        dates, A, B, LA, LB, in_a, in_b = _align(base_arrays, _program_arrays(df, zones, labels))
+        week = _weeks(dates)
+        delta = B - A
+        both = in_a & in_b
+        row = {"Scenario": name, "Days_changed": int(((np.abs(delta) > tol).any(axis=1) & both).sum()),
+               "Only_before": int((in_a & ~in_b).sum()), "Only_after": int((in_b & ~in_a).sum())}
+        row.update({f"{c}_changes": int((both & (LA[c] != LB[c])).sum()) for c in labels})
+        row.update(dict(zip(zones, delta.sum(axis=0))))
+        row["Total_delta"] = float(delta.sum())
+        rows.append(row)
+        w = _weekly(week, A, B, zones).drop(columns=["Total_before", "Total_after"])
+        w.insert(0, "Scenario", name)
+        weekly.append(w)
+    summary = pd.DataFrame(rows)
+    weekly = pd.concat(weekly, ignore_index=True) if weekly else pd.DataFrame(columns=["Scenario", "Week"])
+    return summary, weekly
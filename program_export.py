@@ -0,0 +1,142 @@
+"""Program workbooks (Program / WeekPlan / Notes / Methods) and a streamed ZIP of a squad's workbooks.
+
+    with open("squad.zip", "wb") as f:
+        export_squad_zip(athletes, f, base="base_calendar.xlsx", executor="process")
+
+    return StreamingResponse(iter_squad_zip(athletes, base), media_type="application/zip")
+
+Athletes are generated and written one at a time; the archive goes out in chunks as each
+workbook is added, so memory is bounded by the workbooks in flight (one when serial,
+max_workers + 1 with a pool), not by the squad.
+"""
+import io
+import os
+import re
+import zipfile
+
+import pandas as pd
+
+import biathlon_program_generator_segments_taper_v2 as g
+from generator import format_speeds, prescribe_speeds
+from weekplan import build_week_plan
+from workbook_io import write_workbook
+
+NOTES = [
+    "Бележки:",
+    "- Загрявка 15–20', разпускане 10–15'.",
+    "- Контрол на умора: HRV, RPE, сутрешен пулс; избягвай натрупване на висок лактат.",
+    "- Не подреждай тежки интервали 3 последователни дни.",
+    "- Сила: ОСП/ССП според фазата; не претоварвай при висок стрес в З4–З5.",
+]
+METHODS = [
+    {"Zone":"КР (1)", "Method":"Възстановителни L1; дължина според общия обем."},
+    {"Zone":"АР1 (2)", "Method":"Аеробна база; дълги равномерни бягания/ролки; HR 60–75% HRmax."},
+    {"Zone":"АР2 (3)", "Method":"Прагова работа; 3×10' / 4×8' с 2–3' пауза; HR 81–88% HRmax."},
+    {"Zone":"СР (4)", "Method":"Състезателна; 5×4' / 6×3' с 2–3' пауза; HR 89–95% HRmax."},
+    {"Zone":"АНП (5)", "Method":"VO₂max; 8×1' / 12×400м; пълна почивка; >95% HRmax."},
+    {"Zone":"Сила", "Method":"ОСП/ССП 2–3x седмично; избягвай преди ключови интервали."},
+    {"Zone":"Стрелба", "Method":"Суха/комплексна; отделен отчет по твоя стандарт."},
+]
+
+
+def program_sheets(program, week_plan):
+    """The four export sheets for a program already passed through build_week_plan()."""
+    return {
+        "Program": format_speeds(program.drop(columns=["Day_order"], errors="ignore")),
+        "WeekPlan": week_plan,
+        "Notes": pd.DataFrame({"Notes": NOTES}),
+        "Methods": pd.DataFrame(METHODS),
+    }
+
+
+def program_workbook(program, cs=None):
+    """xlsx bytes for one generate_program() result; cs (km/h) adds target speeds per zone."""
+    if cs:
+        program = prescribe_speeds(program, cs)
+    program, week_plan = build_week_plan(program)
+    return write_workbook(program_sheets(program, week_plan))
+
+
+def athlete_workbook(athlete, base):
+    """xlsx bytes for one athlete dict (as for generate_programs_batch, plus optional 'cs')."""
+    return program_workbook(g.generate_for_athlete(athlete, base), cs=athlete.get("cs"))
+
+
+def athlete_file_names(athletes):
+    """Unique, file-system safe '<name>.xlsx' per athlete ('athlete_<n>' without a name)."""
+    names, seen = [], {}
+    for i, a in enumerate(athletes):
+        stem = re.sub(r"[^\w.-]+", "_", str(a.get("name", f"athlete_{i + 1}"))).strip("._") or f"athlete_{i + 1}"
+        seen[stem] = seen.get(stem, 0) + 1
+        names.append(f"{stem}.xlsx" if seen[stem] == 1 else f"{stem}_{seen[stem]}.xlsx")
+    return names
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink; zipfile then streams entries with data descriptors."""
+
+    def __init__(self):
+        self.chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+class ZipStream:
+    """ZIP archive written entry by entry; add() and close() return the bytes produced so far.
+
+    Nothing but the current entry is held, so an archive can be sent while it is being built.
+    """
+
+    def __init__(self, compression=zipfile.ZIP_DEFLATED):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=compression)
+
+    def add(self, name, data):
+        self._zip.writestr(name, data)
+        return self._sink.drain()
+
+    def close(self):
+        self._zip.close()  # central directory
+        return self._sink.drain()
+
+
+def iter_squad_zip(athletes, base=None, executor=None, max_workers=None, compression=zipfile.ZIP_DEFLATED):
+    """Yield a ZIP archive with one workbook per athlete, in chunks, one athlete at a time.
+
+    athletes: as for generate_programs_batch, plus optional 'cs' (km/h) for target speeds;
+    'name' becomes the file name (athlete_<n> otherwise). base: base file or prepare_base() result.
+    executor: None (serial), "process" or "thread"; at most max_workers + 1 workbooks are pending.
+    """
+    athletes = list(athletes)
+    window = (max_workers or os.cpu_count() or 1) + 1
+    zs = ZipStream(compression)
+    books = g.map_with_base(athlete_workbook, athletes, base, executor, max_workers, window=window)
+    for name, data in zip(athlete_file_names(athletes), books):
+        yield zs.add(name, data)
+        del data
+    yield zs.close()
+
+
+def export_squad_zip(athletes, target=None, base=None, executor=None, max_workers=None):
+    """Write the squad ZIP to target (path or binary file object); with target=None return it as bytes."""
+    if target is None:
+        return b"".join(iter_squad_zip(athletes, base, executor, max_workers))
+    if isinstance(target, (str, bytes)) or hasattr(target, "__fspath__"):
+        with open(target, "wb") as f:
+            return export_squad_zip(athletes, f, base, executor, max_workers)
+    for chunk in iter_squad_zip(athletes, base, executor, max_workers):
+        target.write(chunk)
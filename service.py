@@ -0,0 +1,207 @@
+"""HTTP service around generate_program and the ACWR / CS models.
+
+    uvicorn service:app --host 0.0.0.0 --port 8000
+
+Flow: POST /bases with the base Excel file → {"sha": ...}; then POST /programs with
+{"base_sha", "vo2max", "starts", "seed", ...}?format=json|parquet|xlsx|csv, or POST
+/squads/zip with {"base_sha", "athletes": [...]} for a streamed ZIP of per-athlete workbooks.
+Generation runs in a bounded process pool (BIATHLON_WORKERS); identical concurrent
+requests share one job. For local tests: TestClient(create_app(executor="thread")).
+"""
+import asyncio
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from acwr_model import acwr_series
+from cache import LRUCache, cached_base, cached_generate_program, file_sha256, program_key
+from cs_model import fit_cs_batch
+from program_export import ZipStream, athlete_file_names, athlete_workbook
+from workbook_io import EXPORT_FORMATS, export_table
+
+class Start(BaseModel):
+    date: str
+    type: str = "Main start"
+
+
+class ProgramRequest(BaseModel):
+    base_sha: str
+    vo2max: float
+    starts: List[Start] = Field(default_factory=list)
+    seed: int = 42
+    scale_base_vo2: float = 65
+    taper_days: int = 7
+    acwr_band: Optional[Tuple[float, float]] = None  # e.g. [0.8, 1.3]; keeps ACWR in band outside tapers
+
+
+class SquadAthlete(BaseModel):
+    name: Optional[str] = None
+    vo2max: float
+    starts: List[Start] = Field(default_factory=list)
+    seed: int = 42
+    scale_base_vo2: float = 65
+    taper_days: int = 7
+    acwr_band: Optional[Tuple[float, float]] = None
+    cs: Optional[float] = None  # km/h; adds target speeds per zone
+
+
+class SquadRequest(BaseModel):
+    base_sha: str
+    athletes: List[SquadAthlete]
+
+
+class AcwrRequest(BaseModel):
+    history: List[Dict]
+    date_col: str = "Date"
+    load_col: str = "Minutes"
+    athlete_col: Optional[str] = None
+    acute: int = 7
+    chronic: int = 28
+
+
+class CsRequest(BaseModel):
+    tests: List[Dict]
+    athlete_col: str = "Athlete"
+    distance_col: str = "distance"
+    time_col: str = "time"
+
+
+def _program_job(base_bytes, params):
+    # runs in a worker; each worker keeps its own parsed-base and program caches
+    return cached_generate_program(base_path=base_bytes, **params)
+
+
+def _squad_workbook_job(base_bytes, athlete):
+    # runs in a worker: the base is parsed (and cached) there, not on the event loop
+    return athlete_workbook(athlete, cached_base(base_bytes))
+
+
+def _records(df):
+    return df.to_json(orient="records", date_format="iso", force_ascii=False)
+
+
+async def _program_response(df, fmt, name):
+    # serialising a multi-season program takes long enough to stall the event loop; do it in a thread
+    if fmt == "json":
+        return Response(await run_in_threadpool(_records, df), media_type="application/json")
+    try:
+        data = await run_in_threadpool(export_table, df, fmt, sheet_name="Program")
+    except ImportError as e:
+        raise HTTPException(501, f"{fmt} export is not available: {e}")
+    media_type, ext = EXPORT_FORMATS[fmt]
+    buf = io.BytesIO(data)
+    return StreamingResponse(iter(lambda: buf.read(64 * 1024), b""), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{name}.{ext}"'})
+
+
+def create_app(executor="process", max_workers=None, max_bases=16):
+    """executor: "process" (default) or "thread"; max_workers bounds concurrent generations."""
+    max_workers = max_workers or int(os.environ.get("BIATHLON_WORKERS", os.cpu_count() or 2))
+    bases = LRUCache(max_items=max_bases)  # sha → uploaded base bytes
+    inflight: Dict[str, asyncio.Future] = {}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+        app.state.pool = pool_cls(max_workers=max_workers)
+        try:
+            yield
+        finally:
+            app.state.pool.shutdown(wait=True, cancel_futures=True)
+
+    app = FastAPI(title="onFlows Biathlon API", lifespan=lifespan)
+
+    async def _generate(req: ProgramRequest):
+        data = bases.get(req.base_sha)
+        if data is None:
+            raise HTTPException(404, "Unknown base_sha; upload the base file to /bases first.")
+        params = req.model_dump(exclude={"base_sha"})
+        key = program_key(req.base_sha, req.vo2max, params["starts"], seed=req.seed,
+                          scale_base_vo2=req.scale_base_vo2, taper_days=req.taper_days, acwr_band=req.acwr_band)
+        fut = inflight.get(key)
+        if fut is None:
+            # first request for this signature runs the job; identical concurrent requests await it
+            loop = asyncio.get_running_loop()
+            fut = asyncio.ensure_future(loop.run_in_executor(app.state.pool, _program_job, data, params))
+            inflight[key] = fut
+            fut.add_done_callback(lambda _: inflight.pop(key, None))
+        return await asyncio.shield(fut)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "executor": executor, "workers": max_workers, "in_flight": len(inflight)}
+
+    @app.post("/bases")
+    async def upload_base(file: UploadFile = File(...)):
+        data = await file.read()
+        sha = file_sha256(data)
+        bases.put(sha, data)
+        return {"sha": sha, "bytes": len(data)}
+
+    @app.post("/programs")
+    async def programs(req: ProgramRequest, format: str = Query("json", pattern="^(json|parquet|xlsx|csv)$")):
+        df = await _generate(req)
+        return await _program_response(df, format, f"program_{req.base_sha[:8]}")
+
+    @app.post("/squads/zip")
+    async def squad_zip(req: SquadRequest):
+        data = bases.get(req.base_sha)
+        if data is None:
+            raise HTTPException(404, "Unknown base_sha; upload the base file to /bases first.")
+        athletes = [a.model_dump(exclude_none=True) for a in req.athletes]
+        return StreamingResponse(_squad_chunks(data, athletes), media_type="application/zip",
+                                 headers={"Content-Disposition": f'attachment; filename="squad_{req.base_sha[:8]}.zip"'})
+
+    async def _squad_chunks(data, athletes):
+        # workbooks are built in the bounded pool, at most max_workers + 1 ahead of the client;
+        # each is added to the archive and sent as soon as it is its turn
+        loop = asyncio.get_running_loop()
+        todo = iter(athletes)
+        submit = lambda a: loop.run_in_executor(app.state.pool, _squad_workbook_job, data, a)  # noqa: E731
+        pending = deque(submit(a) for a in islice(todo, max_workers + 1))
+        zs = ZipStream()
+        try:
+            for name in athlete_file_names(athletes):
+                book = await pending.popleft()
+                pending.extend(submit(a) for a in islice(todo, 1))
+                yield await asyncio.to_thread(zs.add, name, book)
+            yield zs.close()
+        finally:
+            for fut in pending:  # client went away: drop the workbooks not yet started
+                fut.cancel()
+
+    @app.post("/acwr")
+    async def acwr(req: AcwrRequest):
+        hist = pd.DataFrame(req.history)
+        missing = {req.date_col, req.load_col} - set(hist.columns)
+        if missing:
+            raise HTTPException(422, f"history is missing columns: {sorted(missing)}")
+        out = acwr_series(hist, date_col=req.date_col, load_col=req.load_col, athlete_col=req.athlete_col,
+                          acute=req.acute, chronic=req.chronic)
+        return Response(_records(out), media_type="application/json")
+
+    @app.post("/cs")
+    async def cs(req: CsRequest):
+        tests = pd.DataFrame(req.tests)
+        if req.athlete_col not in tests.columns:
+            tests[req.athlete_col] = 0
+        missing = {req.distance_col, req.time_col} - set(tests.columns)
+        if missing:
+            raise HTTPException(422, f"tests are missing columns: {sorted(missing)}")
+        out = fit_cs_batch(tests, athlete_col=req.athlete_col, distance_col=req.distance_col, time_col=req.time_col)
+        return Response(_records(out), media_type="application/json")
+
+    return app
+
+
+app = create_app()
@@ -1,10 +1,18 @@
 import streamlit as st
 import pandas as pd
-import io, tempfile
+import io
+import tempfile
 from typing import List, Dict
 
 # ВАЖНО: файлът с генератора трябва да е в същата папка и да се казва така:
-from biathlon_program_generator_segments_taper_v2 import generate_program
+from biathlon_program_generator_segments_taper_v2 import iter_program_weeks
+from cache import PROGRAM_CACHE, cached_base, cached_generate_program, file_sha256, program_key
+from profiling import log_stage_record
+from generator import prescribe_speeds
+from program_diff import diff_programs
+from program_export import export_squad_zip, program_sheets
+from weekplan import build_week_plan
+from workbook_io import export_table, parquet_available, read_table, write_workbook
 
 st.set_page_config(page_title="onFlows Biathlon Generator", page_icon="🏔️", layout="wide")
 st.title("🏔️ Генератор на тренировъчни програми (биатлон) — разширена версия")
@@ -21,6 +29,10 @@ with col1:
 with col2:
     seed = st.number_input("Seed (за възпроизводимост)", min_value=0, value=42, step=1)
 
+use_acwr = st.checkbox("Дръж ACWR в диапазон (без тейпъра и дните със старт)", value=False)
+acwr_band = st.slider("ACWR диапазон", min_value=0.5, max_value=2.0, value=(0.8, 1.3), step=0.05,
+                      disabled=not use_acwr)
+
 st.subheader("Състезания (дата + тип)")
 st.caption("Добавяй редове. Тип: Main start (основен) или Control start (контролен).")
 
@@ -40,64 +52,16 @@ except Exception:
 base_file = st.file_uploader("Качи базовия Excel шаблон (напр. base_calendar.xlsx)", type=["xlsx"])
 out_name = st.text_input("Име на изходния файл (без разширение)", value="generated_program_extended")
 
-gen_btn = st.button("Генерирай програма", type="primary")
-
-# ---------------- ПОМОЩНИ ФУНКЦИИ ----------------
-def ensure_columns(df: pd.DataFrame) -> pd.DataFrame:
-    if "Date" in df.columns:
-        df["Date"] = pd.to_datetime(df["Date"])
-    if "Day" not in df.columns:
-        if "Date" in df.columns:
-            df["Day"] = df["Date"].dt.day_name()
-        else:
-            df["Day"] = ""
-    if "Week" not in df.columns:
-        if "Date" in df.columns:
-            start = df["Date"].min()
-            df["Week"] = ((df["Date"] - start).dt.days // 7) + 1
-        else:
-            df["Week"] = 1
-    return df
-
-def augment_with_notes(df: pd.DataFrame) -> pd.DataFrame:
-    zone_to_label = {1: "КР", 2: "АР1", 3: "АР2", 4: "СР", 5: "АНП"}
-    method_by_zone = {
-        1: "Зона 1 (КР): възстановителна аеробна работа, ниска интензивност, разговорно темпо.",
-        2: "Зона 2 (АР1): развитие на аеробна база; дълги равномерни натоварвания.",
-        3: "Зона 3 (АР2): прагова зона; контролирани интервали 6–12 мин, стабилно темпо.",
-        4: "Зона 4 (СР): близо до състезателна; интервали 3–6 мин, фокус върху икономичност.",
-        5: "Зона 5 (АНП): висока интензивност/VO₂max; 30“–3’ интервали с пълно възстановяване.",
-    }
-    if "Strength" not in df.columns:
-        df["Strength"] = ""
-    if "Zone" in df.columns:
-        df["ZoneLabel"] = df["Zone"].apply(lambda z: zone_to_label.get(int(z), str(z)) if pd.notna(z) else "")
-    else:
-        df["ZoneLabel"] = ""
-
-    def build_note(row):
-        z = int(row.get("Zone", 0)) if pd.notna(row.get("Zone", None)) else 0
-        mins = int(row.get("Minutes", 0)) if pd.notna(row.get("Minutes", None)) else 0
-        strength = row.get("Strength", "")
-        base = method_by_zone.get(z, "Описание по зона не е дефинирано.")
-        extra = []
-        if mins: extra.append(f"~{mins} мин.")
-        if strength: extra.append(f"Сила: {strength}.")
-        return f"{base} " + " ".join(extra) if extra else base
+# Профилирането по етапи мери само време; проследяването на паметта (tracemalloc) забавя генерирането няколко пъти
+profile_memory = st.checkbox("Профилирай и паметта (по-бавно)", value=False)
 
-    df["Note"] = df.apply(build_note, axis=1)
-    return df
+gen_btn = st.button("Генерирай програма", type="primary")
 
 # ---------------- ИЗПЪЛНЕНИЕ ----------------
 if gen_btn:
     if base_file is None:
         st.error("Моля, качи базовия Excel шаблон (.xlsx).")
     else:
-        # Пишем качения файл във временен път, защото генераторът иска path
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-            tmp.write(base_file.read())
-            base_path = tmp.name
-
         try:
             starts: List[Dict] = []
             for _, row in starts_df.iterrows():
@@ -105,61 +69,185 @@ if gen_btn:
                 t = str(row.get("type", "Main start"))
                 starts.append({"date": d.isoformat(), "type": t})
 
-            df = generate_program(vo2max=vo2max, starts=starts, seed=seed, base_path=base_path)
-            df = ensure_columns(df)
-
-            day_order = {
-                "Monday":1,"Tuesday":2,"Wednesday":3,"Thursday":4,"Friday":5,"Saturday":6,"Sunday":7,
-                "Mon":1,"Tue":2,"Wed":3,"Thu":4,"Fri":5,"Sat":6,"Sun":7
-            }
-            df["Day_order"] = df.get("Day", "").map(day_order) if "Day" in df.columns else 8
-            df = df.sort_values(["Week","Day_order","Date"], ascending=[True, True, True], na_position="last")
-            df = augment_with_notes(df)
-
-            cols = ["Week","Date","Day","Zone","ZoneLabel","Minutes","Strength","Note"]
-            week_plan = df[[c for c in cols if c in df.columns]].copy()
-
-            methods = pd.DataFrame([
-                {"Zone":"КР (1)", "Method":"Възстановителни L1; дължина според общия обем."},
-                {"Zone":"АР1 (2)", "Method":"Аеробна база; дълги равномерни бягания/ролки; HR 60–75% HRmax."},
-                {"Zone":"АР2 (3)", "Method":"Прагова работа; 3×10' / 4×8' с 2–3' пауза; HR 81–88% HRmax."},
-                {"Zone":"СР (4)", "Method":"Състезателна; 5×4' / 6×3' с 2–3' пауза; HR 89–95% HRmax."},
-                {"Zone":"АНП (5)", "Method":"VO₂max; 8×1' / 12×400м; пълна почивка; >95% HRmax."},
-                {"Zone":"Сила", "Method":"ОСП/ССП 2–3x седмично; избягвай преди ключови интервали."},
-                {"Zone":"Стрелба", "Method":"Суха/комплексна; отделен отчет по твоя стандарт."},
-            ])
+            # Кеш по SHA на базата + състезания + параметри: повторно генериране/сваляне е мигновено.
+            # Ако са променени само състезанията, предишната програма се допълва инкрементално.
+            base_bytes = base_file.getvalue()
+            band = tuple(acwr_band) if use_acwr else None
+            sig = (file_sha256(base_bytes), float(vo2max), int(seed), band)
+            last = st.session_state.get("last_program")
+            previous = (last["df"], last["starts"]) if last and last["sig"] == sig else None
+            stage_records: List[Dict] = []
+
+            def on_stage(rec):
+                stage_records.append(rec)
+                log_stage_record(rec)
+
+            key = program_key(sig[0], vo2max, starts, seed=seed, acwr_band=band)
+            if previous is None and band is None:
+                # Кешът се проверява тук (брои се попадение/пропуск); при пропуск седмиците идват поред
+                # и първите се показват веднага
+                df = PROGRAM_CACHE.get(key)
+                if df is None:
+                    preview = st.empty()
+                    base = cached_base(base_bytes)
+                    weeks, plan_parts = [], []
+                    for week, week_df in iter_program_weeks(vo2max, starts, seed=seed, base=base,
+                                                            profile=on_stage, profile_memory=profile_memory):
+                        weeks.append(week_df)
+                        if week <= 9:
+                            # планът се строи само за новата седмица (номерът ѝ идва от генератора)
+                            plan_parts.append(build_week_plan(week_df.assign(Week=week))[1])
+                            preview.dataframe(pd.concat(plan_parts, ignore_index=True))
+                    preview.empty()
+                    df = pd.concat(weeks) if weeks else pd.DataFrame()
+                    # седмиците идват по дати; в кеша влиза редът на generate_program (редът на базата)
+                    order = base["base_df"].index
+                    df = df.loc[order[order.isin(df.index)]]
+                    PROGRAM_CACHE.put(key, df.copy())
+                else:
+                    df = df.copy()
+            else:
+                df = cached_generate_program(vo2max=vo2max, starts=starts, seed=seed, base_path=base_bytes,
+                                             previous=previous, profile=on_stage, profile_memory=profile_memory,
+                                             acwr_band=band)
+            st.session_state["last_program"] = {"sig": sig, "starts": starts, "df": df.copy()}
+            # Целеви скорости по зони, ако CS е изчислен в демо секцията по-долу
+            if st.session_state.get("demo_cs"):
+                df = prescribe_speeds(df, st.session_state["demo_cs"])
+
+            df, week_plan = build_week_plan(df)
 
             st.success("Готово! Виж прегледа и свали Excel.")
+            cstats = PROGRAM_CACHE.stats()
+            st.caption(f"Кеш на програми: {cstats['hits']} попадения / {cstats['misses']} пропуска")
             with st.expander("Преглед на седмичния план (първите 60 реда)"):
                 st.dataframe(week_plan.head(60))
+            with st.expander("Профилиране по етапи (време, редове, памет)"):
+                if stage_records:
+                    prof_df = pd.DataFrame(stage_records)
+                    if "week" in prof_df.columns:
+                        # поточно генериране: етапите на всяка седмица се сумират
+                        prof_df = prof_df.groupby("stage", sort=False).agg(
+                            seconds=("seconds", "sum"), rows=("rows", "sum"), peak_mb=("peak_mb", "max"),
+                            weeks=("week", "nunique")).reset_index()
+                    st.dataframe(prof_df)
+                    st.caption(f"Общо: {prof_df['seconds'].sum():.3f} s")
+                else:
+                    st.caption("Програмата е взета от кеша или допълнена инкрементално — етапите не са профилирани.")
+
+            # Сваляне на Excel (много листа) без запис на диск; редовете се пишат поточно
+            sheets = program_sheets(df, week_plan)
+            program_sheet = sheets["Program"]
+            data = write_workbook(sheets)
 
-            # Сваляне на Excel (много листа) без запис на диск
-            from pandas import ExcelWriter
-            buf = io.BytesIO()
-            with ExcelWriter(buf, engine="openpyxl") as writer:
-                df.drop(columns=["Day_order"], errors="ignore").to_excel(writer, index=False, sheet_name="Program")
-                week_plan.to_excel(writer, index=False, sheet_name="WeekPlan")
-                pd.DataFrame({"Notes":[
-                    "Бележки:",
-                    "- Загрявка 15–20', разпускане 10–15'.",
-                    "- Контрол на умора: HRV, RPE, сутрешен пулс; избягвай натрупване на висок лактат.",
-                    "- Не подреждай тежки интервали 3 последователни дни.",
-                    "- Сила: ОСП/ССП според фазата; не претоварвай при висок стрес в З4–З5.",
-                ]}).to_excel(writer, index=False, sheet_name="Notes")
-                methods.to_excel(writer, index=False, sheet_name="Methods")
-            buf.seek(0)
-
-            fname = (out_name or "generated_program_extended").strip().replace(" ", "_") + ".xlsx"
+            stem = (out_name or "generated_program_extended").strip().replace(" ", "_")
             st.download_button(
                 "📥 Изтегли разширен Excel (много листа)",
-                data=buf,
-                file_name=fname,
+                data=data,
+                file_name=stem + ".xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
+            # Program и WeekPlan като отделни таблици (CSV винаги, Parquet ако има pyarrow/fastparquet)
+            formats = ["csv"] + (["parquet"] if parquet_available() else [])
+            cols = st.columns(2 * len(formats))
+            for i, (sheet, table) in enumerate([("Program", program_sheet), ("WeekPlan", week_plan)]):
+                for j, fmt in enumerate(formats):
+                    cols[i * len(formats) + j].download_button(
+                        f"{sheet} ({fmt.upper()})",
+                        data=export_table(table, fmt),
+                        file_name=f"{stem}_{sheet}.{fmt}",
+                        mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet",
+                        key=f"dl_{sheet}_{fmt}",
+                    )
 
         except Exception as e:
             st.error(f"Възникна грешка: {e}")
             st.exception(e)
+
+# ---------------- ОТБОР: ZIP с Excel за всеки състезател ----------------
+st.markdown("---")
+with st.expander("👥 Отбор — ZIP с Excel за всеки състезател", expanded=False):
+    st.caption("Таблица с колони `name`, `vo2max` и по избор `seed`, `cs` (km/h). "
+               "Състезанията и базата са общите от горе; всеки файл се генерира и записва поотделно.")
+    squad_default = pd.DataFrame([{"name": "Athlete_1", "vo2max": 65.0, "seed": 42, "cs": None}])
+    squad_df = st.data_editor(squad_default, num_rows="dynamic", key="squad_editor")
+    if st.button("Генерирай ZIP за отбора", key="btn_squad"):
+        if base_file is None:
+            st.error("Моля, качи базовия Excel шаблон (.xlsx).")
+        else:
+            try:
+                team_starts = [{"date": pd.to_datetime(r.get("date")).date().isoformat(),
+                                "type": str(r.get("type", "Main start"))} for _, r in starts_df.iterrows()]
+                band = tuple(acwr_band) if use_acwr else None
+                athletes = []
+                for _, r in squad_df.dropna(subset=["vo2max"]).iterrows():
+                    athletes.append({
+                        "name": str(r.get("name") or f"athlete_{len(athletes) + 1}"),
+                        "vo2max": float(r["vo2max"]),
+                        "seed": int(r["seed"]) if pd.notna(r.get("seed")) else 42,
+                        "cs": float(r["cs"]) if pd.notna(r.get("cs")) else None,
+                        "starts": team_starts,
+                        "acwr_band": band,
+                    })
+                # Работните книги се генерират и пишат една по една във временен файл;
+                # download_button след това чете целия архив в паметта
+                with tempfile.TemporaryFile() as zip_file:
+                    export_squad_zip(athletes, zip_file, base=cached_base(base_file.getvalue()))
+                    zip_file.seek(0)
+                    zip_data = zip_file.read()
+                st.download_button("📦 Изтегли ZIP (по един Excel на състезател)", data=zip_data,
+                                   file_name="squad_programs.zip", mime="application/zip")
+            except Exception as e:
+                st.error(f"Възникна грешка: {e}")
+                st.exception(e)
+
+# ---------------- СРАВНЕНИЕ НА ДВЕ ПРОГРАМИ ----------------
+st.markdown("---")
+with st.expander("🔍 Сравнение на програми (какво се промени)", expanded=False):
+    st.caption("Запомни текущата програма като база, промени VO₂max или състезанията и генерирай отново — "
+               "или качи два изтеглени Excel файла (лист `Program`).")
+    src = st.radio("Източник", ["Запомнена база ↔ текуща програма", "Два Excel файла"], horizontal=True)
+    before_df = after_df = None
+    if src.startswith("Запомнена"):
+        last = st.session_state.get("last_program")
+        if st.button("Запомни текущата програма като база", disabled=last is None, key="btn_diff_base"):
+            st.session_state["diff_baseline"] = last["df"].copy()
+        before_df = st.session_state.get("diff_baseline")
+        after_df = last["df"] if last else None
+    else:
+        d1, d2 = st.columns(2)
+        f_before = d1.file_uploader("Преди (.xlsx)", type=["xlsx"], key="diff_before")
+        f_after = d2.file_uploader("След (.xlsx)", type=["xlsx"], key="diff_after")
+        if f_before and f_after:
+            try:
+                before_df = read_table(f_before, sheet_name="Program")
+                after_df = read_table(f_after, sheet_name="Program")
+            except Exception as e:
+                st.error(f"Файлът не може да се прочете (нужен е лист `Program`): {e}")
+
+    if before_df is not None and after_df is not None:
+        try:
+            diff = diff_programs(before_df, after_df)
+            counts, totals = diff["counts"], diff["totals"].set_index("Zone")
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Общо минути", f"{totals.loc['Total', 'After']:.0f}", f"{totals.loc['Total', 'Delta']:+.0f}")
+            m2.metric("Дни с променени минути", counts["Days_changed"])
+            m3.metric("Дни само в едната", counts["Only_before"] + counts["Only_after"])
+            m4.metric("Сменени фаза/старт/тема", len(diff["labels"]))
+            st.dataframe(diff["totals"].round(1))
+            st.caption("Разлика по седмици (след − преди), минути по зони:")
+            zone_cols = [c for c in diff["weekly"].columns if c not in ("Week", "Total_before", "Total_after", "Total_delta")]
+            st.bar_chart(diff["weekly"].set_index("Week")[zone_cols])
+            if len(diff["labels"]):
+                st.caption("Сменени Phase / Start_type / Week_theme:")
+                st.dataframe(diff["labels"])
+            changed_days = diff["daily"][diff["daily"]["Changed"]]
+            st.caption(f"Променени дни ({len(changed_days)}):")
+            st.dataframe(changed_days.round(1))
+        except Exception as e:
+            st.error(f"Сравнението не бе успешно: {e}")
+    else:
+        st.caption("Няма какво да се сравни още.")
 # ---------------- DEMO: Модели (CS & ACWR) и комбиниране ----------------
 import io
 
@@ -167,7 +255,7 @@ st.markdown("---")
 with st.expander("🧪 Модели (CS & ACWR) – демо (комбиниране)", expanded=False):
     # Импорт на твоите нови модули
     from cs_model import compute_cs
-    from acwr_model import compute_acwr
+    from acwr_model import acwr_series, compute_acwr
     from generator import generate_plan as gen_simple_plan
 
     st.subheader("Critical Speed от два TT теста")
@@ -195,6 +283,9 @@ with st.expander("🧪 Модели (CS & ACWR) – демо (комбинира
             st.metric("ACWR", f"{acwr_val:.2f}" if acwr_val else "n/a")
             st.caption("Показваме последните 28 реда (ако има):")
             st.dataframe(hist_df.tail(28))
+            if "Date" in hist_df.columns:
+                st.caption("ACWR по дни (rolling 7/28 и EWMA):")
+                st.line_chart(acwr_series(hist_df).set_index("Date")[["ACWR", "ACWR_EWMA"]])
         else:
             st.error("Файлът трябва да съдържа колона 'Minutes'.")
 
@@ -0,0 +1,91 @@
+"""Scenario sweep: many generate_program variants against one base calendar.
+
+    summary, weekly = sweep_programs("base_calendar.xlsx", vo2max=[60, 63, 66],
+                                     calendars={"A": starts_a, "B": starts_b}, seeds=[1, 2, 3])
+    summary.sort_values("Taper_minutes")
+
+The base is parsed and its statistics (including taper profiles for every
+taper_days in the grid) are derived once; grid points run in parallel and
+workers return only their summaries, not whole programs.
+"""
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+import biathlon_program_generator_segments_taper_v2 as g
+
+SCENARIO_COLS = ["Scenario", "Calendar", "VO2max", "Seed", "Taper_days", "ACWR_band"]
+
+
+def summarize_program(df, taper_days=7):
+    """Weekly totals per zone and per-program totals of one generate_program() result.
+
+    Weeks are counted from the first program day (Week 1 = days 0–6, as in weekplan).
+    Returns (totals, weekly): totals is a dict with 'Weeks', 'Days', 'Total_minutes',
+    one entry per zone column, 'Taper_minutes' (load inside the taper_days before each
+    start) and 'Competition_days'; weekly is a frame with 'Week', the zone columns and 'Total'.
+    """
+    zones = [c for c in g.ZONE_COLS if c in df.columns]
+    mins = df[zones].to_numpy(dtype=float)
+    day_total = mins.sum(axis=1)
+    dates = pd.to_datetime(df["Date"])
+    week = ((dates - dates.min()).dt.days // 7).to_numpy(dtype=int) if len(df) else np.zeros(0, dtype=int)
+    n_weeks = int(week.max()) + 1 if len(week) else 0
+    weekly = pd.DataFrame({z: np.bincount(week, mins[:, i], n_weeks) for i, z in enumerate(zones)})
+    weekly.insert(0, "Week", np.arange(1, n_weeks + 1))
+    weekly["Total"] = np.bincount(week, day_total, n_weeks)
+
+    to_next = df["Days_to_next_start"].to_numpy(dtype=float)
+    in_taper = (to_next >= 1) & (to_next <= taper_days)
+    totals = {"Weeks": n_weeks, "Days": len(df), "Total_minutes": float(day_total.sum())}
+    totals.update({z: float(mins[:, i].sum()) for i, z in enumerate(zones)})
+    totals["Taper_minutes"] = float(day_total[in_taper].sum())
+    totals["Competition_days"] = int(df["Is_Start"].astype(bool).sum())
+    return totals, weekly
+
+
+def _sweep_point(point, base):
+    df = g.generate_program(point["VO2max"], point["starts"], seed=point["Seed"], base=base,
+                            taper_days=point["Taper_days"], acwr_band=point["ACWR_band"])
+    totals, weekly = summarize_program(df, taper_days=point["Taper_days"])
+    if point["ACWR_band"] is not None:
+        totals["ACWR_violations"] = df.attrs["acwr"]["violations_after"]
+    return totals, weekly
+
+
+def sweep_programs(base, vo2max, calendars, seeds=(42,), taper_days=(7,), acwr_band=(None,),
+                   executor="process", max_workers=None):
+    """Run generate_program over the grid vo2max × calendars × seeds × taper_days × acwr_band.
+
+    base: base file path / bytes or the result of prepare_base().
+    calendars: {name: starts} or a list of starts lists (named by position).
+    executor: "process", "thread" or None (see map_with_base).
+    Returns (summary, weekly): summary has one row per scenario with its grid parameters
+    and the totals of summarize_program(); weekly has one row per scenario and week with
+    the zone totals. Both carry the 'Scenario' number for joining.
+    """
+    # derive every taper profile once, before the workers start
+    base = g.with_taper_profiles(base, taper_days)
+    if not isinstance(calendars, dict):
+        calendars = dict(enumerate(calendars))
+
+    points = []
+    for i, (v, (cal, starts), seed, td, band) in enumerate(
+            itertools.product(vo2max, calendars.items(), seeds, taper_days, acwr_band)):
+        points.append({"Scenario": i, "Calendar": cal, "VO2max": float(v), "Seed": int(seed),
+                       "Taper_days": int(td), "ACWR_band": None if band is None else tuple(band),
+                       "starts": starts})
+
+    chunk = max(1, len(points) // (4 * (max_workers or os.cpu_count() or 1)))
+    results = list(g.map_with_base(_sweep_point, points, base, executor, max_workers, chunksize=chunk))
+
+    params = pd.DataFrame([{k: p[k] for k in SCENARIO_COLS} for p in points], columns=SCENARIO_COLS)
+    summary = pd.concat([params, pd.DataFrame([t for t, _ in results], index=params.index)], axis=1)
+    if results:
+        weekly = pd.concat([w.assign(Scenario=p["Scenario"]) for p, (_, w) in zip(points, results)], ignore_index=True)
+        weekly = weekly[["Scenario"] + [c for c in weekly.columns if c != "Scenario"]]
+    else:
+        weekly = pd.DataFrame(columns=["Scenario", "Week"])
+    return summary, weekly
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# ---------------- Етикети и описания по зони ----------------
+ZONE_TO_LABEL = {1: "КР", 2: "АР1", 3: "АР2", 4: "СР", 5: "АНП"}
+METHOD_BY_ZONE = {
+    1: "Зона 1 (КР): възстановителна аеробна работа, ниска интензивност, разговорно темпо.",
+    2: "Зона 2 (АР1): развитие на аеробна база; дълги равномерни натоварвания.",
+    3: "Зона 3 (АР2): прагова зона; контролирани интервали 6–12 мин, стабилно темпо.",
+    4: "Зона 4 (СР): близо до състезателна; интервали 3–6 мин, фокус върху икономичност.",
+    5: "Зона 5 (АНП): висока интензивност/VO₂max; 30“–3’ интервали с пълно възстановяване.",
+}
+METHOD_UNKNOWN = "Описание по зона не е дефинирано."
+DAY_ORDER = {
+    "Monday":1,"Tuesday":2,"Wednesday":3,"Thursday":4,"Friday":5,"Saturday":6,"Sunday":7,
+    "Mon":1,"Tue":2,"Wed":3,"Thu":4,"Fri":5,"Sat":6,"Sun":7
+}
+WEEK_PLAN_COLS = ["Week","Date","Day","Zone","ZoneLabel","Minutes","Strength","Note"]
+
+def _lookup(values, mapping, default):
+    """Категориен lookup: стойности → mapping[v] (default за липсващи), без цикъл по редове."""
+    keys = list(mapping)
+    codes = pd.Categorical(values, categories=keys).codes
+    lut = np.array([mapping[k] for k in keys] + [default], dtype=object)
+    return lut[codes]  # код -1 → последният елемент (default)
+
+def ensure_columns(df: pd.DataFrame) -> pd.DataFrame:
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"])
+    if "Day" not in df.columns:
+        if "Date" in df.columns:
+            df["Day"] = df["Date"].dt.day_name()
+        else:
+            df["Day"] = ""
+    if "Week" not in df.columns:
+        if "Date" in df.columns:
+            start = df["Date"].min()
+            df["Week"] = ((df["Date"] - start).dt.days // 7) + 1
+        else:
+            df["Week"] = 1
+    return df
+
+def sort_by_week_day(df: pd.DataFrame) -> pd.DataFrame:
+    """Day_order от имената на дните (Monday/Mon → 1 …, непознат → NaN) и сортиране Week, Day_order, Date.
+
+    Day_order е int, когато всички дни са познати, иначе float (както при Series.map).
+    """
+    if "Day" in df.columns:
+        order = _lookup(df["Day"], DAY_ORDER, np.nan).astype(float)
+        df["Day_order"] = order if np.isnan(order).any() else order.astype(np.int64)
+    else:
+        df["Day_order"] = 8
+    return df.sort_values(["Week","Day_order","Date"], ascending=[True, True, True], na_position="last")
+
+def _zone_ints(df):
+    """Зоната като цяло число (0 за липсваща) и маска на липсващите."""
+    if "Zone" not in df.columns:
+        return np.zeros(len(df), dtype=int), np.ones(len(df), dtype=bool)
+    z = pd.to_numeric(df["Zone"], errors="coerce").to_numpy(dtype=float)
+    missing = np.isnan(z)
+    return np.where(missing, 0, np.trunc(z)).astype(int), missing
+
+def _truthy(s: pd.Series):
+    """bool(x) за всеки елемент (NaN е True, както в Python)."""
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        v = s.to_numpy(dtype=float)
+        return (v != 0) | np.isnan(v)
+    return s.astype(object).map(bool).to_numpy(dtype=bool)
+
+def augment_with_notes(df: pd.DataFrame) -> pd.DataFrame:
+    """ZoneLabel и Note за всеки ред (векторизирано)."""
+    if "Strength" not in df.columns:
+        df["Strength"] = ""
+    z, z_missing = _zone_ints(df)
+    if "Zone" in df.columns:
+        fallback = df["Zone"].astype(str).to_numpy(dtype=object)
+        label = _lookup(z, ZONE_TO_LABEL, None)
+        label = np.where(label == None, fallback, label)  # noqa: E711 - непозната зона → str(z)
+        df["ZoneLabel"] = np.where(z_missing, "", label)
+    else:
+        df["ZoneLabel"] = ""
+
+    base = _lookup(z, METHOD_BY_ZONE, METHOD_UNKNOWN)
+    if "Minutes" in df.columns:
+        m = pd.to_numeric(df["Minutes"], errors="coerce").to_numpy(dtype=float)
+        mins = np.where(np.isnan(m), 0, np.trunc(m)).astype(np.int64)
+    else:
+        mins = np.zeros(len(df), dtype=np.int64)
+    has_min = mins != 0
+    has_str = _truthy(df["Strength"])
+    min_txt = np.char.add(np.char.add("~", mins.astype(str)), " мин.").astype(object)
+    # astype(object).map(str): липсващите стават "None"/"nan" като във f-string, не остават float
+    str_txt = ("Сила: " + df["Strength"].astype(object).map(str) + ".").to_numpy(dtype=object)
+    extra = np.where(has_min & has_str, min_txt + " " + str_txt, np.where(has_min, min_txt, str_txt))
+    df["Note"] = np.where(has_min | has_str, base + " " + extra, base)
+    return df
+
+def build_week_plan(df: pd.DataFrame):
+    """Program → (сортирана програма с бележки, WeekPlan таблица) за експорт."""
+    df = sort_by_week_day(ensure_columns(df))
+    df = augment_with_notes(df)
+    week_plan = df[[c for c in WEEK_PLAN_COLS if c in df.columns]].copy()
+    return df, week_plan
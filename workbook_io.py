@@ -0,0 +1,153 @@
+"""Pluggable table I/O: fast Excel reading, constant-memory xlsx writing, Parquet/CSV export.
+
+    df = read_table("base_calendar.xlsx")              # calamine if installed, else openpyxl
+    data = write_workbook({"Program": df, "WeekPlan": wp})   # bytes, rows streamed to disk
+    data = export_table(df, "parquet")                 # or "csv" / "xlsx"
+
+Readers are tried in READ_ENGINES order; an engine that is not installed is skipped.
+Writers: xlsxwriter in constant_memory mode when installed, otherwise openpyxl in
+write-only mode. Both write row by row, so memory stays flat for season-long workbooks.
+"""
+import importlib.util
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+READ_ENGINES = ["calamine", "openpyxl"]
+WRITE_ENGINES = ["xlsxwriter", "openpyxl"]
+_ENGINE_MODULES = {"calamine": "python_calamine", "openpyxl": "openpyxl", "xlsxwriter": "xlsxwriter"}
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("text/csv", "csv"),
+}
+CHUNK_ROWS = 10_000
+
+
+def available_engines(engines):
+    """The engines from `engines` whose package is importable, in order."""
+    return [e for e in engines if importlib.util.find_spec(_ENGINE_MODULES.get(e, e)) is not None]
+
+
+def read_table(source, engine=None, sheet_name=0):
+    """Read a base table from a path, raw bytes or a file-like object.
+
+    Paths ending in .csv or .parquet are read directly. Excel input goes through the
+    first available engine of READ_ENGINES (or `engine`), falling back to the next one
+    if an engine fails to import or to open the file.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        ext = os.path.splitext(str(source))[1].lower()
+        if ext == ".csv":
+            return pd.read_csv(source)
+        if ext == ".parquet":
+            return pd.read_parquet(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    engines = [engine] if engine else available_engines(READ_ENGINES) or [None]
+    err = None
+    for eng in engines:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        try:
+            return pd.read_excel(source, sheet_name=sheet_name, engine=eng)
+        except (ImportError, ValueError) as e:
+            err = e  # engine missing in this pandas or cannot read the file: try the next one
+    raise err
+
+
+def _cell_columns(df):
+    """Column values as Python objects ready for a cell writer: NaN/NaT → None, datetimes → datetime."""
+    cols = []
+    for _, s in df.items():
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype(object)
+        if pd.api.types.is_datetime64_any_dtype(s):
+            vals = np.array(s.dt.to_pydatetime(), dtype=object)
+        else:
+            vals = np.array(s.to_numpy(dtype=object), dtype=object)  # writable copy
+        missing = pd.isna(s).to_numpy()
+        vals[missing] = None
+        cols.append(vals)
+    return cols
+
+
+def _iter_rows(df):
+    """Rows of df as lists of cell values, converted CHUNK_ROWS at a time."""
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        for row in zip(*[v.tolist() for v in _cell_columns(chunk)]):
+            yield list(row)
+
+
+def _write_xlsxwriter(sheets, target):
+    import xlsxwriter
+    wb = xlsxwriter.Workbook(target, {"constant_memory": True, "in_memory": False,
+                                      "strings_to_numbers": False, "nan_inf_to_errors": True})
+    date_fmt = wb.add_format({"num_format": "yyyy-mm-dd"})
+    head_fmt = wb.add_format({"bold": True})
+    for name, df in sheets.items():
+        ws = wb.add_worksheet(name)
+        ws.write_row(0, 0, [str(c) for c in df.columns], head_fmt)
+        for j, (_, s) in enumerate(df.items()):
+            if pd.api.types.is_datetime64_any_dtype(s):
+                ws.set_column(j, j, 12, date_fmt)
+        # constant_memory mode needs rows in order: write each row once, top to bottom
+        for i, row in enumerate(_iter_rows(df), start=1):
+            for j, v in enumerate(row):
+                if v is not None:
+                    ws.write(i, j, v, date_fmt if hasattr(v, "year") else None)
+    wb.close()
+
+
+def _write_openpyxl(sheets, target):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(title=name)
+        header = []
+        for c in df.columns:
+            cell = WriteOnlyCell(ws, value=str(c))
+            cell.font = Font(bold=True)
+            header.append(cell)
+        ws.append(header)
+        for row in _iter_rows(df):
+            ws.append(row)
+    wb.save(target)
+
+
+_WRITERS = {"xlsxwriter": _write_xlsxwriter, "openpyxl": _write_openpyxl}
+
+
+def write_workbook(sheets, target=None, engine=None):
+    """Write {sheet name: DataFrame} as one xlsx workbook, streaming rows (index not written).
+
+    target: path or binary file object; None returns the workbook as bytes.
+    engine: "xlsxwriter" or "openpyxl"; default is the first available of WRITE_ENGINES.
+    """
+    engine = engine or (available_engines(WRITE_ENGINES) or ["openpyxl"])[0]
+    out = io.BytesIO() if target is None else target
+    _WRITERS[engine](sheets, out)
+    return out.getvalue() if target is None else None
+
+
+def export_table(df, fmt="xlsx", sheet_name="Sheet1"):
+    """One table as bytes in fmt: "xlsx" (streamed writer), "parquet" (needs pyarrow or
+    fastparquet; raises ImportError otherwise) or "csv" (UTF-8 with BOM, opens cleanly in Excel)."""
+    if fmt == "xlsx":
+        return write_workbook({sheet_name: df})
+    if fmt == "parquet":
+        frame = df.copy()
+        frame.columns = [str(c) for c in frame.columns]
+        return frame.to_parquet(index=False)
+    if fmt == "csv":
+        return df.to_csv(index=False).encode("utf-8-sig")
+    raise ValueError(f"Unknown export format: {fmt!r} (use one of {sorted(EXPORT_FORMATS)})")
+
+
+def parquet_available():
+    return bool(available_engines(["pyarrow", "fastparquet"]))